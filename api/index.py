@@ -13,6 +13,10 @@ os.environ.setdefault('PYTHONUNBUFFERED', '1')
 backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
 sys.path.insert(0, backend_path)
 
+# Create the MongoDB client during the init phase, outside the request handler,
+# so warm invocations reuse its connection pool
+import database.mongodb  # noqa: F401
+
 # Import FastAPI app directly
 from main import app
 
@@ -0,0 +1,38 @@
+"""Cache of AI CV extraction results, keyed by a hash of the CV text."""
+from functools import lru_cache
+from typing import Optional, Dict
+from datetime import datetime
+from database.mongodb import MongoDB
+
+
+class CVCacheRepository:
+    """Repository for cached CV extraction results."""
+    
+    # Cached extractions expire after 30 days (TTL index on created_at)
+    TTL_SECONDS = 30 * 24 * 60 * 60
+    
+    def __init__(self):
+        self.collection = MongoDB.get_collection("cv_extraction_cache")
+        self.db = self.collection.database
+    
+    async def get_extracted_data(self, digest: str) -> Optional[Dict]:
+        """Get the cached extraction for a CV text digest."""
+        entry = await self.collection.find_one(
+            {"digest": digest},
+            {"_id": 0, "extracted_data": 1}
+        )
+        return entry["extracted_data"] if entry else None
+    
+    async def set_extracted_data(self, digest: str, extracted_data: Dict) -> None:
+        """Store the extraction for a CV text digest."""
+        await self.collection.update_one(
+            {"digest": digest},
+            {"$set": {"extracted_data": extracted_data, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+
+@lru_cache(maxsize=None)
+def get_cv_cache_repo() -> CVCacheRepository:
+    """Get the shared CVCacheRepository instance."""
+    return CVCacheRepository()
@@ -1,5 +1,6 @@
 """Document repository for MongoDB operations."""
-from typing import Optional, List
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, List, Union
 from datetime import datetime
 from bson import ObjectId
 from database.mongodb import MongoDB
@@ -8,9 +9,23 @@ from database.mongodb import MongoDB
 class DocumentRepository:
     """Repository for document operations."""
     
+    # Fields returned by list queries; leaves out the large extracted_text blob
+    LIST_PROJECTION = {
+        "user_id": 1,
+        "filename": 1,
+        "original_filename": 1,
+        "file_type": 1,
+        "file_size": 1,
+        "s3_url": 1,
+        "s3_key": 1,
+        "summary": 1,
+        "summary_created_at": 1,
+        "created_at": 1,
+    }
+    
     def __init__(self):
-        self.db = MongoDB.get_database()
-        self.collection = self.db.documents
+        self.collection = MongoDB.get_collection("documents")
+        self.db = self.collection.database
     
     async def create_document(self, document_data: dict) -> str:
         """Create a new document record."""
@@ -18,26 +33,49 @@ class DocumentRepository:
         result = await self.collection.insert_one(document_data)
         return str(result.inserted_id)
     
-    async def get_document_by_id(self, document_id: str) -> Optional[dict]:
-        """Get document by ID."""
-        doc = await self.collection.find_one({"_id": ObjectId(document_id)})
+    async def get_document_by_id(
+        self,
+        document_id: Union[str, ObjectId],
+        fields: Optional[List[str]] = None
+    ) -> Optional[dict]:
+        """Get document by ID, optionally loading only the given fields."""
+        projection = dict.fromkeys(fields, 1) if fields else None
+        doc = await self.collection.find_one({"_id": ObjectId(document_id)}, projection)
         if doc:
             doc['id'] = str(doc['_id'])
             del doc['_id']
         return doc
     
+    async def get_documents_by_ids(
+        self,
+        document_ids: Iterable[str],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, dict]:
+        """Get several documents in one query, keyed by string id; invalid ids are skipped."""
+        object_ids = [ObjectId(i) for i in set(document_ids) if ObjectId.is_valid(i)]
+        if not object_ids:
+            return {}
+        projection = dict.fromkeys(fields, 1) if fields else None
+        cursor = self.collection.find({"_id": {"$in": object_ids}}, projection)
+        return {str(doc.pop("_id")): doc async for doc in cursor}
+    
     async def get_documents_by_user(self, user_id: str) -> List[dict]:
         """Get all documents for a user."""
-        cursor = self.collection.find({"user_id": user_id}).sort("created_at", -1)
-        documents = []
-        async for doc in cursor:
-            doc['id'] = str(doc['_id'])
-            del doc['_id']
-            documents.append(doc)
-        return documents
+        # Let the server emit the string id so no per-document ObjectId conversion is needed
+        cursor = self.collection.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"created_at": -1}},
+            {"$project": {**self.LIST_PROJECTION, "_id": 0, "id": {"$toString": "$_id"}}},
+        ])
+        return await cursor.to_list(length=None)
     
-    async def delete_document(self, document_id: str) -> bool:
+    async def delete_document(self, document_id: Union[str, ObjectId]) -> bool:
         """Delete a document."""
         result = await self.collection.delete_one({"_id": ObjectId(document_id)})
         return result.deleted_count > 0
 
+
+@lru_cache(maxsize=None)
+def get_document_repo() -> DocumentRepository:
+    """Get the shared DocumentRepository instance."""
+    return DocumentRepository()
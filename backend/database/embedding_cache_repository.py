@@ -0,0 +1,50 @@
+"""Cache of professor profile embeddings, keyed by a hash of the model and profile text."""
+from functools import lru_cache
+from typing import Dict, List
+from datetime import datetime
+from pymongo import UpdateOne
+from database.mongodb import MongoDB
+
+
+class EmbeddingCacheRepository:
+    """Repository for cached embeddings (stored as raw float32 bytes)."""
+    
+    # Cached embeddings expire after 30 days (TTL index on created_at)
+    TTL_SECONDS = 30 * 24 * 60 * 60
+    
+    def __init__(self):
+        self.collection = MongoDB.get_collection("embedding_cache")
+        self.db = self.collection.database
+    
+    async def get_embeddings(self, digests: List[str]) -> Dict[str, bytes]:
+        """Get the cached embeddings for several digests in one query."""
+        if not digests:
+            return {}
+        cursor = self.collection.find(
+            {"digest": {"$in": digests}},
+            {"_id": 0, "digest": 1, "embedding": 1}
+        )
+        return {entry["digest"]: bytes(entry["embedding"]) async for entry in cursor}
+    
+    async def set_embeddings(self, embeddings: Dict[str, bytes]) -> None:
+        """Store embeddings by digest in one round-trip."""
+        if not embeddings:
+            return
+        now = datetime.utcnow()
+        await self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"digest": digest},
+                    {"$set": {"embedding": embedding, "created_at": now}},
+                    upsert=True
+                )
+                for digest, embedding in embeddings.items()
+            ],
+            ordered=False
+        )
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache_repo() -> EmbeddingCacheRepository:
+    """Get the shared EmbeddingCacheRepository instance."""
+    return EmbeddingCacheRepository()
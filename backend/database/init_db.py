@@ -1,6 +1,18 @@
 """Initialize MongoDB database with collections and indexes."""
 import asyncio
+from pymongo.errors import OperationFailure
 from database.mongodb import MongoDB
+from database.cv_cache_repository import CVCacheRepository
+from database.embedding_cache_repository import EmbeddingCacheRepository
+from database.registration_repository import get_registration_repo
+
+
+async def _create_unique_profile_index(db):
+    """One profile per user; older data may hold duplicates, which must not abort init."""
+    try:
+        await db.professor_profiles.create_index("user_id", unique=True)
+    except OperationFailure as e:
+        print(f"⚠️ Could not create unique professor_profiles.user_id index: {e}")
 
 
 async def init_database():
@@ -8,38 +20,47 @@ async def init_database():
     try:
         db = MongoDB.get_database()
         
-        # Create collections if they don't exist
-        collections = ['users', 'documents', 'registrations']
+        # Check which collections exist (one round-trip for all of them).
+        # Missing collections are created implicitly by create_index below.
+        collections = ['users', 'documents', 'registrations', 'notifications', 'professor_profiles']
+        existing_collections = set(await db.list_collection_names())
         for collection_name in collections:
-            # Check if collection exists
-            existing_collections = await db.list_collection_names()
             if collection_name not in existing_collections:
-                # Create collection by inserting and deleting a dummy document
-                await db[collection_name].insert_one({"_init": True})
-                await db[collection_name].delete_one({"_init": True})
-                print(f"✓ Created collection: {collection_name}")
+                print(f"✓ Collection will be created with its indexes: {collection_name}")
             else:
                 print(f"✓ Collection already exists: {collection_name}")
         
         # Create indexes
+        # Indexes are independent, so build them concurrently
         print("\nCreating indexes...")
-        
-        # Users indexes
-        await db.users.create_index("google_id", unique=True)
-        await db.users.create_index("email")
-        print("✓ Created indexes for users collection")
-        
-        # Documents indexes
-        await db.documents.create_index("user_id")
-        await db.documents.create_index("created_at")
-        print("✓ Created indexes for documents collection")
-        
-        # Registrations indexes
-        await db.registrations.create_index("student_id")
-        await db.registrations.create_index("professor_id")
-        await db.registrations.create_index("document_id")
-        await db.registrations.create_index("status")
-        print("✓ Created indexes for registrations collection")
+
+        await asyncio.gather(
+            # Users indexes
+            db.users.create_index("google_id", unique=True),
+            db.users.create_index("email"),
+            # Documents indexes
+            # Compound index serves "documents of a user, newest first" without an in-memory sort
+            db.documents.create_index([("user_id", 1), ("created_at", -1)], background=True),
+            # Registrations indexes: the repository owns the list, and tolerates
+            # legacy duplicates that block the unique (student, document) index
+            get_registration_repo().ensure_indexes(),
+            # Notifications indexes (equality on user_id first, then sort/filter field)
+            db.notifications.create_index([("user_id", 1), ("created_at", -1)], background=True),
+            db.notifications.create_index([("user_id", 1), ("is_read", 1)], background=True),
+            # Professor profiles indexes (one profile per user, target of upserts)
+            _create_unique_profile_index(db),
+            # CV extraction cache: one entry per CV text digest, expired by TTL
+            db.cv_extraction_cache.create_index("digest", unique=True),
+            db.cv_extraction_cache.create_index(
+                "created_at", expireAfterSeconds=CVCacheRepository.TTL_SECONDS
+            ),
+            # Professor embedding cache: one entry per (model, profile text) digest
+            db.embedding_cache.create_index("digest", unique=True),
+            db.embedding_cache.create_index(
+                "created_at", expireAfterSeconds=EmbeddingCacheRepository.TTL_SECONDS
+            ),
+        )
+        print("✓ Created indexes for users, documents, registrations, notifications, professor_profiles, cv_extraction_cache and embedding_cache")
         
         print("\n✅ Database initialization completed!")
         
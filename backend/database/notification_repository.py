@@ -1,5 +1,7 @@
 """Notification repository for MongoDB operations."""
-from typing import Optional, List
+import asyncio
+from functools import lru_cache
+from typing import Optional, List, Tuple, Union
 from datetime import datetime
 from bson import ObjectId
 from database.mongodb import MongoDB
@@ -8,9 +10,34 @@ from database.mongodb import MongoDB
 class NotificationRepository:
     """Repository for notification operations."""
     
+    # Fields exposed by the notifications API
+    LIST_PROJECTION = {
+        "user_id": 1,
+        "type": 1,
+        "title": 1,
+        "message": 1,
+        "related_user_id": 1,
+        "related_registration_id": 1,
+        "related_document_id": 1,
+        "is_read": 1,
+        "created_at": 1,
+    }
+    
+    # created_at as datetime.isoformat() + "Z" would print it: BSON dates hold
+    # milliseconds, which isoformat shows as six digits and omits when zero
+    CREATED_AT_ISO = {"$concat": [
+        {"$dateToString": {"date": "$created_at", "format": "%Y-%m-%dT%H:%M:%S"}},
+        {"$cond": [
+            {"$eq": [{"$millisecond": "$created_at"}, 0]},
+            "",
+            {"$concat": [".", {"$dateToString": {"date": "$created_at", "format": "%L"}}, "000"]},
+        ]},
+        "Z",
+    ]}
+    
     def __init__(self):
-        self.db = MongoDB.get_database()
-        self.collection = self.db.notifications
+        self.collection = MongoDB.get_collection("notifications")
+        self.db = self.collection.database
     
     async def create_notification(self, notification_data: dict) -> str:
         """Create a new notification."""
@@ -21,16 +48,38 @@ class NotificationRepository:
     
     async def get_notifications_by_user(self, user_id: str, limit: int = 50) -> List[dict]:
         """Get all notifications for a user, sorted by newest first."""
-        cursor = self.collection.find({"user_id": user_id}).sort("created_at", -1).limit(limit)
-        notifications = []
-        async for notif in cursor:
-            notif['id'] = str(notif['_id'])
-            del notif['_id']
-            # Convert datetime to ISO format string with timezone info
-            if 'created_at' in notif and isinstance(notif['created_at'], datetime):
-                notif['created_at'] = notif['created_at'].isoformat() + 'Z'  # Add Z to indicate UTC
-            notifications.append(notif)
-        return notifications
+        # The server renames _id and formats created_at as an ISO string with Z (UTC),
+        # so the documents come back already shaped for the API
+        cursor = self.collection.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"created_at": -1}},
+            {"$limit": limit},
+            {"$project": {
+                **self.LIST_PROJECTION,
+                "_id": 0,
+                "id": {"$toString": "$_id"},
+                "created_at": self.CREATED_AT_ISO,
+            }},
+        ])
+        return await cursor.to_list(length=limit)
+    
+    async def list_with_unread_count(self, user_id: str, limit: int = 50) -> Tuple[List[dict], int]:
+        """Get a user's newest notifications and their unread count in one concurrent wait."""
+        # Two queries rather than one $facet: inside $facet the sort cannot use the
+        # (user_id, created_at) index, while each query here is index-backed
+        notifications, unread_count = await asyncio.gather(
+            self.get_notifications_by_user(user_id, limit),
+            self.get_unread_count(user_id)
+        )
+        return notifications, unread_count
+    
+    async def exists_for_user(self, notification_id: Union[str, ObjectId], user_id: str) -> bool:
+        """Check that a notification exists and belongs to the user."""
+        notification = await self.collection.find_one(
+            {"_id": ObjectId(notification_id), "user_id": user_id},
+            {"_id": 1}
+        )
+        return notification is not None
     
     async def get_unread_count(self, user_id: str) -> int:
         """Get count of unread notifications for a user."""
@@ -40,7 +89,7 @@ class NotificationRepository:
         })
         return count
     
-    async def mark_as_read(self, notification_id: str) -> bool:
+    async def mark_as_read(self, notification_id: Union[str, ObjectId]) -> bool:
         """Mark a notification as read."""
         result = await self.collection.update_one(
             {"_id": ObjectId(notification_id)},
@@ -50,14 +99,28 @@ class NotificationRepository:
     
     async def mark_all_as_read(self, user_id: str) -> bool:
         """Mark all notifications as read for a user."""
+        return await self.mark_all_as_read_and_return_prior_count(user_id) > 0
+    
+    async def mark_all_as_read_and_return_prior_count(self, user_id: str) -> int:
+        """
+        Mark all notifications as read and return how many were unread.
+        
+        The update only matches unread notifications, so modified_count is the
+        prior unread count and no separate count query is needed.
+        """
         result = await self.collection.update_many(
             {"user_id": user_id, "is_read": False},
             {"$set": {"is_read": True}}
         )
-        return result.modified_count > 0
+        return result.modified_count
     
-    async def delete_notification(self, notification_id: str) -> bool:
+    async def delete_notification(self, notification_id: Union[str, ObjectId]) -> bool:
         """Delete a notification."""
         result = await self.collection.delete_one({"_id": ObjectId(notification_id)})
         return result.deleted_count > 0
 
+
+@lru_cache(maxsize=None)
+def get_notification_repo() -> NotificationRepository:
+    """Get the shared NotificationRepository instance."""
+    return NotificationRepository()
@@ -1,17 +1,41 @@
 """Repository for professor profile operations."""
-from typing import Optional, List, Dict
+from functools import lru_cache
+from typing import AsyncIterator, Optional, List, Dict, Iterable, Union
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 from database.mongodb import MongoDB
+from database.redis_cache import cache_delete, cache_get, cache_set
+
+
+def _join_list(value) -> Optional[str]:
+    """Join a list field for profile_text; non-list values are skipped."""
+    return ", ".join(value) if isinstance(value, list) else None
 
 
 class ProfessorProfileRepository:
     """Repository for managing professor profiles."""
     
+    # (field, label, formatter) for each line of profile_text, in order.
+    # A formatter returning None drops the line.
+    _PROFILE_FIELDS = (
+        ("name", "Tên", str),
+        ("title", "Chức danh", str),
+        ("department", "Khoa/Bộ môn", str),
+        ("bio", "Tiểu sử", str),
+        ("research_interests", "Lĩnh vực nghiên cứu", _join_list),
+        ("expertise_areas", "Chuyên môn", _join_list),
+        ("education", "Học vấn", str),
+        ("publications", "Công trình nghiên cứu", str),
+    )
+    
+    # Fields that profile_text and is_complete are derived from
+    PROFILE_TEXT_FIELDS = tuple(field for field, _, _ in _PROFILE_FIELDS)
+    
     def __init__(self):
         self.collection_name = "professor_profiles"
-        self.db = MongoDB.get_database()
-        self.collection = self.db[self.collection_name]
+        self.collection = MongoDB.get_collection(self.collection_name)
+        self.db = self.collection.database
     
     async def get_collection(self):
         """Get MongoDB collection."""
@@ -29,8 +53,7 @@ class ProfessorProfileRepository:
         profile_data["is_complete"] = self._check_completeness(profile_data)
         
         # Set timestamps
-        profile_data["created_at"] = datetime.utcnow()
-        profile_data["updated_at"] = datetime.utcnow()
+        profile_data["created_at"] = profile_data["updated_at"] = datetime.utcnow()
         
         result = await collection.insert_one(profile_data)
         return str(result.inserted_id)
@@ -44,7 +67,7 @@ class ProfessorProfileRepository:
             del profile["_id"]
         return profile
     
-    async def get_profile_by_id(self, profile_id: str) -> Optional[Dict]:
+    async def get_profile_by_id(self, profile_id: Union[str, ObjectId]) -> Optional[Dict]:
         """Get profile by ID."""
         collection = await self.get_collection()
         try:
@@ -56,17 +79,34 @@ class ProfessorProfileRepository:
         except Exception:
             return None
     
-    async def update_profile(self, user_id: str, update_data: Dict) -> bool:
-        """Update professor profile."""
+    async def get_profiles_by_ids(
+        self,
+        profile_ids: Iterable[str],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Dict]:
+        """Get several profiles in one query, keyed by string id; invalid ids are skipped."""
+        collection = await self.get_collection()
+        object_ids = [ObjectId(i) for i in set(profile_ids) if ObjectId.is_valid(i)]
+        if not object_ids:
+            return {}
+        projection = dict.fromkeys(fields, 1) if fields else None
+        cursor = collection.find({"_id": {"$in": object_ids}}, projection)
+        return {str(doc.pop("_id")): doc async for doc in cursor}
+    
+    async def update_profile(self, user_id: str, update_data: Dict) -> Optional[Dict]:
+        """Update (or create) a professor profile and return the updated document."""
         collection = await self.get_collection()
         
-        # Generate updated profile text
-        existing = await self.get_profile_by_user_id(user_id)
-        if existing:
-            merged_data = {**existing, **update_data}
-        else:
+        # profile_text and is_complete only depend on PROFILE_TEXT_FIELDS. The
+        # routers always send all of them, so the existing document only has to
+        # be read for partial updates.
+        if all(field in update_data for field in self.PROFILE_TEXT_FIELDS):
             merged_data = update_data
+        else:
+            existing = await self.get_profile_by_user_id(user_id)
+            merged_data = {**existing, **update_data} if existing else update_data
         
+        # Generate updated profile text
         profile_text = self._generate_profile_text(merged_data)
         update_data["profile_text"] = profile_text
         
@@ -74,23 +114,32 @@ class ProfessorProfileRepository:
         update_data["is_complete"] = self._check_completeness(merged_data)
         
         # Update timestamp
-        update_data["updated_at"] = datetime.utcnow()
+        now = datetime.utcnow()
+        update_data["updated_at"] = now
         
-        result = await collection.update_one(
+        # Return the post-update document so callers don't have to read it back
+        profile = await collection.find_one_and_update(
             {"user_id": user_id},
-            {"$set": update_data},
-            upsert=True
+            {"$set": update_data, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
-        return result.modified_count > 0 or result.upserted_id is not None
+        if profile:
+            profile["id"] = str(profile["_id"])
+            del profile["_id"]
+        return profile
+    
+    async def iter_complete_profiles(self, batch_size: int = 100) -> AsyncIterator[Dict]:
+        """Stream profiles that are complete enough for matching, one batch at a time."""
+        collection = await self.get_collection()
+        cursor = collection.find({"is_complete": True}).batch_size(batch_size)
+        async for profile in cursor:
+            profile["id"] = str(profile.pop("_id"))
+            yield profile
     
     async def get_all_complete_profiles(self) -> List[Dict]:
         """Get all profiles that are complete enough for matching."""
-        collection = await self.get_collection()
-        profiles = await collection.find({"is_complete": True}).to_list(length=1000)
-        for profile in profiles:
-            profile["id"] = str(profile["_id"])
-            del profile["_id"]
-        return profiles
+        return [profile async for profile in self.iter_complete_profiles()]
     
     async def delete_profile(self, user_id: str) -> bool:
         """Delete professor profile."""
@@ -100,30 +149,12 @@ class ProfessorProfileRepository:
     
     def _generate_profile_text(self, profile_data: Dict) -> str:
         """Generate combined text for embedding."""
-        parts = []
-        
-        if profile_data.get("name"):
-            parts.append(f"Tên: {profile_data['name']}")
-        if profile_data.get("title"):
-            parts.append(f"Chức danh: {profile_data['title']}")
-        if profile_data.get("department"):
-            parts.append(f"Khoa/Bộ môn: {profile_data['department']}")
-        if profile_data.get("bio"):
-            parts.append(f"Tiểu sử: {profile_data['bio']}")
-        if profile_data.get("research_interests"):
-            interests = profile_data["research_interests"]
-            if isinstance(interests, list):
-                parts.append(f"Lĩnh vực nghiên cứu: {', '.join(interests)}")
-        if profile_data.get("expertise_areas"):
-            expertise = profile_data["expertise_areas"]
-            if isinstance(expertise, list):
-                parts.append(f"Chuyên môn: {', '.join(expertise)}")
-        if profile_data.get("education"):
-            parts.append(f"Học vấn: {profile_data['education']}")
-        if profile_data.get("publications"):
-            parts.append(f"Công trình nghiên cứu: {profile_data['publications']}")
-        
-        return "\n".join(parts)
+        lines = (
+            (label, formatter(value))
+            for field, label, formatter in self._PROFILE_FIELDS
+            if (value := profile_data.get(field))
+        )
+        return "\n".join(f"{label}: {text}" for label, text in lines if text is not None)
     
     def _check_completeness(self, profile_data: Dict) -> bool:
         """Check if profile is complete enough for matching."""
@@ -139,3 +170,58 @@ class ProfessorProfileRepository:
         )
         return has_basic_info and has_content
 
+
+
+class CachedProfileRepository(ProfessorProfileRepository):
+    """ProfessorProfileRepository that caches single-profile reads in Redis (when configured)."""
+    
+    @staticmethod
+    def _id_key(profile_id: Union[str, ObjectId]) -> str:
+        return f"profile:id:{profile_id}"
+    
+    @staticmethod
+    def _uid_key(user_id: str) -> str:
+        return f"profile:uid:{user_id}"
+    
+    async def get_profile_by_user_id(self, user_id: str) -> Optional[Dict]:
+        """Get profile by user ID, from the cache when possible."""
+        profile = await cache_get(self._uid_key(user_id))
+        if profile is None:
+            profile = await super().get_profile_by_user_id(user_id)
+            if profile:
+                await cache_set(self._uid_key(user_id), profile)
+        return profile
+    
+    async def get_profile_by_id(self, profile_id: Union[str, ObjectId]) -> Optional[Dict]:
+        """Get profile by ID, from the cache when possible."""
+        profile = await cache_get(self._id_key(profile_id))
+        if profile is None:
+            profile = await super().get_profile_by_id(profile_id)
+            if profile:
+                await cache_set(self._id_key(profile_id), profile)
+        return profile
+    
+    async def update_profile(self, user_id: str, update_data: Dict) -> Optional[Dict]:
+        """Update profile and drop its cached copies."""
+        profile = await super().update_profile(user_id, update_data)
+        keys = [self._uid_key(user_id)]
+        if profile:
+            keys.append(self._id_key(profile["id"]))
+        await cache_delete(*keys)
+        return profile
+    
+    async def delete_profile(self, user_id: str) -> bool:
+        """Delete profile and drop its cached copies."""
+        collection = await self.get_collection()
+        # find_one_and_delete hands back the _id needed for the id-keyed entry
+        deleted = await collection.find_one_and_delete({"user_id": user_id}, projection={"_id": 1})
+        if deleted is None:
+            return False
+        await cache_delete(self._uid_key(user_id), self._id_key(deleted["_id"]))
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_profile_repo() -> ProfessorProfileRepository:
+    """Get the shared (cached) professor profile repository."""
+    return CachedProfileRepository()
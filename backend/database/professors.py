@@ -1,8 +1,107 @@
 """Database for professor profiles."""
+import hashlib
 import json
+import logging
+import mmap
 import os
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from pathlib import Path
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib parser
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # binary snapshot is optional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+# Default professor data, built once at import and shared read-only by every instance
+_DEFAULT_PROFESSORS = (
+    MappingProxyType({
+        "id": "prof_1",
+        "name": "TS. Nguyễn Văn A",
+        "title": "Phó Giáo sư",
+        "department": "Khoa Công nghệ Thông tin",
+        "expertise": "Trí tuệ nhân tạo, Machine Learning, Deep Learning",
+        "research_interests": "Xử lý ngôn ngữ tự nhiên, Computer Vision, Hệ thống khuyến nghị",
+        "description": "Chuyên gia về AI và Machine Learning với hơn 15 năm kinh nghiệm. Nghiên cứu về NLP và Computer Vision.",
+        "keywords": ["AI", "Machine Learning", "NLP", "Computer Vision", "Deep Learning"],
+        "email": "nguyenvana@university.edu.vn",
+        "publications": 45
+    }),
+    MappingProxyType({
+        "id": "prof_2",
+        "name": "TS. Trần Thị B",
+        "title": "Giảng viên chính",
+        "department": "Khoa Kinh tế",
+        "expertise": "Kinh tế học ứng dụng, Phân tích dữ liệu kinh tế",
+        "research_interests": "Kinh tế lượng, Phân tích chính sách, Kinh tế phát triển",
+        "description": "Chuyên gia về kinh tế học ứng dụng và phân tích dữ liệu. Nghiên cứu về chính sách kinh tế và phát triển.",
+        "keywords": ["Kinh tế", "Phân tích dữ liệu", "Kinh tế lượng", "Chính sách"],
+        "email": "tranthib@university.edu.vn",
+        "publications": 32
+    }),
+    MappingProxyType({
+        "id": "prof_3",
+        "name": "TS. Lê Văn C",
+        "title": "Phó Giáo sư",
+        "department": "Khoa Sinh học",
+        "expertise": "Sinh học phân tử, Di truyền học, Công nghệ sinh học",
+        "research_interests": "Genomics, Proteomics, Sinh học tính toán",
+        "description": "Chuyên gia về sinh học phân tử và di truyền học. Nghiên cứu về genomics và công nghệ sinh học.",
+        "keywords": ["Sinh học", "Di truyền", "Genomics", "Công nghệ sinh học"],
+        "email": "levanc@university.edu.vn",
+        "publications": 38
+    }),
+    MappingProxyType({
+        "id": "prof_4",
+        "name": "TS. Phạm Thị D",
+        "title": "Giảng viên",
+        "department": "Khoa Văn học",
+        "expertise": "Văn học Việt Nam, Văn học so sánh, Phê bình văn học",
+        "research_interests": "Văn học đương đại, Văn học dân gian, Văn học và văn hóa",
+        "description": "Chuyên gia về văn học Việt Nam và văn học so sánh. Nghiên cứu về văn học đương đại và văn hóa.",
+        "keywords": ["Văn học", "Văn học Việt Nam", "Phê bình", "Văn hóa"],
+        "email": "phamthid@university.edu.vn",
+        "publications": 28
+    }),
+    MappingProxyType({
+        "id": "prof_5",
+        "name": "TS. Hoàng Văn E",
+        "title": "Phó Giáo sư",
+        "department": "Khoa Toán học",
+        "expertise": "Toán ứng dụng, Thống kê, Phân tích số liệu",
+        "research_interests": "Toán tối ưu, Thống kê Bayes, Phân tích dữ liệu lớn",
+        "description": "Chuyên gia về toán ứng dụng và thống kê. Nghiên cứu về toán tối ưu và phân tích dữ liệu.",
+        "keywords": ["Toán học", "Thống kê", "Tối ưu", "Phân tích dữ liệu"],
+        "email": "hoangvane@university.edu.vn",
+        "publications": 42
+    }),
+    MappingProxyType({
+        "id": "prof_6",
+        "name": "TS. Võ Thị F",
+        "title": "Giảng viên chính",
+        "department": "Khoa Hóa học",
+        "expertise": "Hóa học hữu cơ, Hóa học vật liệu, Hóa học tính toán",
+        "research_interests": "Vật liệu nano, Hóa học xanh, Phát triển thuốc",
+        "description": "Chuyên gia về hóa học hữu cơ và vật liệu. Nghiên cứu về vật liệu nano và hóa học xanh.",
+        "keywords": ["Hóa học", "Vật liệu", "Nano", "Hóa học xanh"],
+        "email": "vothif@university.edu.vn",
+        "publications": 35
+    }),
+)
+
+
+# Parsed professors files shared by every ProfessorDatabase instance:
+# data_file -> (st_mtime_ns, professors). An entry is reused only while the
+# file's mtime is unchanged, so edits to the file are still picked up.
+_PROFESSORS_CACHE: Dict[str, Tuple[int, List[Dict]]] = {}
 
 
 class ProfessorDatabase:
@@ -25,6 +124,11 @@ class ProfessorDatabase:
         self.data_file = data_file
         self._professors = []
         self._load_professors()
+        # Index by id for O(1) lookups; kept in sync by add_professor
+        self._by_id = {p["id"]: p for p in self._professors if "id" in p}
+        # Serialized /api/professors body and its ETag, built on first use
+        self._cached_json = None
+        self._cached_etag = None
     
     def _load_professors(self):
         """Load professors from JSON file."""
@@ -34,133 +138,142 @@ class ProfessorDatabase:
         # In serverless, always use default professors
         if is_serverless or self.data_file is None:
             self._professors = self._get_default_professors()
-            print("Using default professors (serverless environment)")
+            logger.debug("Using default professors (serverless environment)")
             return
         
         # Try to load from file for local development
         try:
             if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self._professors = json.load(f)
+                mtime_ns = os.stat(self.data_file).st_mtime_ns
+                cached = _PROFESSORS_CACHE.get(self.data_file)
+                # Each instance gets its own list over the shared parsed entries, so
+                # add_professor on one instance cannot leave the list of another out
+                # of step with that instance's _by_id index and cached JSON body
+                if cached is not None and cached[0] == mtime_ns:
+                    self._professors = list(cached[1])
+                    return
+                
+                professors = self._read_professors_file(mtime_ns)
+                _PROFESSORS_CACHE[self.data_file] = (mtime_ns, professors)
+                self._professors = list(professors)
             else:
                 # File not found, use defaults
                 self._professors = self._get_default_professors()
-                print(f"Using default professors (file not found: {self.data_file})")
+                logger.debug("Using default professors (file not found: %s)", self.data_file)
         except (OSError, IOError, PermissionError) as e:
             # Read-only filesystem or permission error - use defaults
-            print(f"Error loading professors (read-only filesystem?): {e}")
+            logger.warning("Error loading professors (read-only filesystem?): %s", e)
             self._professors = self._get_default_professors()
         except Exception as e:
-            print(f"Error loading professors: {e}")
+            logger.warning("Error loading professors: %s", e)
             self._professors = self._get_default_professors()
     
+    @property
+    def _snapshot_file(self) -> str:
+        """Path of the msgpack snapshot kept next to the JSON file."""
+        return os.path.splitext(self.data_file)[0] + ".msgpack"
+    
+    def _read_professors_file(self, json_mtime_ns: int) -> List[Dict]:
+        """Parse the professors file, preferring an up-to-date msgpack snapshot."""
+        if msgpack is not None:
+            try:
+                if os.stat(self._snapshot_file).st_mtime_ns >= json_mtime_ns:
+                    with open(self._snapshot_file, 'rb') as f:
+                        return msgpack.unpackb(f.read(), raw=False)
+            except Exception:
+                pass  # missing, stale or unreadable snapshot - parse the JSON
+        
+        if orjson is not None:
+            with open(self.data_file, 'rb') as f:
+                try:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty files cannot be mapped
+                    professors = orjson.loads(f.read())
+                else:
+                    # Parse straight from the page cache instead of copying into bytes
+                    with mapped, memoryview(mapped) as view:
+                        professors = orjson.loads(view)
+        else:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                professors = json.load(f)
+        # Only reached when the snapshot is missing or older than the (hand-edited)
+        # JSON: regenerate it, best-effort (skipped on read-only filesystems)
+        self._write_snapshot(professors)
+        return professors
+    
+    def _write_snapshot(self, professors: List[Dict]):
+        """Write the msgpack snapshot so the next cold start skips JSON parsing."""
+        if msgpack is None:
+            return
+        # Write aside and rename, so a concurrent reader never sees a partial
+        # snapshot whose mtime already beats the JSON file
+        tmp_file = f"{self._snapshot_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(msgpack.packb(professors))
+            os.replace(tmp_file, self._snapshot_file)
+        except (OSError, IOError, PermissionError):
+            logger.debug("Cannot write professors snapshot: %s", self._snapshot_file)
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+    
     def _save_professors(self):
         """Save professors to JSON file."""
         try:
             # Skip saving in serverless environment (read-only filesystem)
             if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
-                print("Skipping save professors (serverless environment)")
+                logger.debug("Skipping save professors (serverless environment)")
                 return
             
             os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self._professors, f, ensure_ascii=False, indent=2)
+            professors = [dict(p) for p in self._professors]
+            if orjson is not None:
+                # orjson writes UTF-8 as-is, like ensure_ascii=False
+                with open(self.data_file, 'wb') as f:
+                    f.write(orjson.dumps(professors, option=orjson.OPT_INDENT_2))
+            else:
+                with open(self.data_file, 'w', encoding='utf-8') as f:
+                    json.dump(professors, f, ensure_ascii=False, indent=2)
+            self._write_snapshot(professors)
         except (OSError, IOError, PermissionError):
             # Ignore write errors in read-only environments
-            print("Cannot save professors (read-only filesystem)")
+            logger.warning("Cannot save professors (read-only filesystem)")
     
     def get_all_professors(self) -> List[Dict]:
         """Get all professors."""
         return self._professors
     
+    def get_professors_json(self) -> Tuple[bytes, str]:
+        """Get the serialized professors listing and its ETag."""
+        if self._cached_json is None:
+            body = {
+                "professors": [dict(p) for p in self._professors],
+                "count": len(self._professors)
+            }
+            if orjson is not None:
+                self._cached_json = orjson.dumps(body)
+            else:
+                self._cached_json = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self._cached_etag = f'"{hashlib.sha1(self._cached_json).hexdigest()}"'
+        return self._cached_json, self._cached_etag
+    
     def get_professor_by_id(self, professor_id: str) -> Dict:
         """Get professor by ID."""
-        for prof in self._professors:
-            if prof.get("id") == professor_id:
-                return prof
-        return None
+        return self._by_id.get(professor_id)
     
     def add_professor(self, professor: Dict):
         """Add a new professor."""
         if "id" not in professor:
             professor["id"] = f"prof_{len(self._professors) + 1}"
         self._professors.append(professor)
+        self._by_id[professor["id"]] = professor
+        self._cached_json = None
         self._save_professors()
     
     def _get_default_professors(self) -> List[Dict]:
         """Get default professor data for testing."""
-        return [
-            {
-                "id": "prof_1",
-                "name": "TS. Nguyễn Văn A",
-                "title": "Phó Giáo sư",
-                "department": "Khoa Công nghệ Thông tin",
-                "expertise": "Trí tuệ nhân tạo, Machine Learning, Deep Learning",
-                "research_interests": "Xử lý ngôn ngữ tự nhiên, Computer Vision, Hệ thống khuyến nghị",
-                "description": "Chuyên gia về AI và Machine Learning với hơn 15 năm kinh nghiệm. Nghiên cứu về NLP và Computer Vision.",
-                "keywords": ["AI", "Machine Learning", "NLP", "Computer Vision", "Deep Learning"],
-                "email": "nguyenvana@university.edu.vn",
-                "publications": 45
-            },
-            {
-                "id": "prof_2",
-                "name": "TS. Trần Thị B",
-                "title": "Giảng viên chính",
-                "department": "Khoa Kinh tế",
-                "expertise": "Kinh tế học ứng dụng, Phân tích dữ liệu kinh tế",
-                "research_interests": "Kinh tế lượng, Phân tích chính sách, Kinh tế phát triển",
-                "description": "Chuyên gia về kinh tế học ứng dụng và phân tích dữ liệu. Nghiên cứu về chính sách kinh tế và phát triển.",
-                "keywords": ["Kinh tế", "Phân tích dữ liệu", "Kinh tế lượng", "Chính sách"],
-                "email": "tranthib@university.edu.vn",
-                "publications": 32
-            },
-            {
-                "id": "prof_3",
-                "name": "TS. Lê Văn C",
-                "title": "Phó Giáo sư",
-                "department": "Khoa Sinh học",
-                "expertise": "Sinh học phân tử, Di truyền học, Công nghệ sinh học",
-                "research_interests": "Genomics, Proteomics, Sinh học tính toán",
-                "description": "Chuyên gia về sinh học phân tử và di truyền học. Nghiên cứu về genomics và công nghệ sinh học.",
-                "keywords": ["Sinh học", "Di truyền", "Genomics", "Công nghệ sinh học"],
-                "email": "levanc@university.edu.vn",
-                "publications": 38
-            },
-            {
-                "id": "prof_4",
-                "name": "TS. Phạm Thị D",
-                "title": "Giảng viên",
-                "department": "Khoa Văn học",
-                "expertise": "Văn học Việt Nam, Văn học so sánh, Phê bình văn học",
-                "research_interests": "Văn học đương đại, Văn học dân gian, Văn học và văn hóa",
-                "description": "Chuyên gia về văn học Việt Nam và văn học so sánh. Nghiên cứu về văn học đương đại và văn hóa.",
-                "keywords": ["Văn học", "Văn học Việt Nam", "Phê bình", "Văn hóa"],
-                "email": "phamthid@university.edu.vn",
-                "publications": 28
-            },
-            {
-                "id": "prof_5",
-                "name": "TS. Hoàng Văn E",
-                "title": "Phó Giáo sư",
-                "department": "Khoa Toán học",
-                "expertise": "Toán ứng dụng, Thống kê, Phân tích số liệu",
-                "research_interests": "Toán tối ưu, Thống kê Bayes, Phân tích dữ liệu lớn",
-                "description": "Chuyên gia về toán ứng dụng và thống kê. Nghiên cứu về toán tối ưu và phân tích dữ liệu.",
-                "keywords": ["Toán học", "Thống kê", "Tối ưu", "Phân tích dữ liệu"],
-                "email": "hoangvane@university.edu.vn",
-                "publications": 42
-            },
-            {
-                "id": "prof_6",
-                "name": "TS. Võ Thị F",
-                "title": "Giảng viên chính",
-                "department": "Khoa Hóa học",
-                "expertise": "Hóa học hữu cơ, Hóa học vật liệu, Hóa học tính toán",
-                "research_interests": "Vật liệu nano, Hóa học xanh, Phát triển thuốc",
-                "description": "Chuyên gia về hóa học hữu cơ và vật liệu. Nghiên cứu về vật liệu nano và hóa học xanh.",
-                "keywords": ["Hóa học", "Vật liệu", "Nano", "Hóa học xanh"],
-                "email": "vothif@university.edu.vn",
-                "publications": 35
-            }
-        ]
-
+        # New list over the shared read-only entries, so add_professor can append
+        return list(_DEFAULT_PROFESSORS)
@@ -0,0 +1,71 @@
+"""Optional Redis read-through cache for documents that rarely change."""
+import logging
+import os
+from functools import lru_cache
+from typing import Optional
+from bson import json_util
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis is optional; without it every read goes to MongoDB
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Cached documents expire after 10 minutes even if an invalidation is missed
+DEFAULT_TTL_SECONDS = 600
+
+# Redis sits in front of MongoDB on hot reads; if it is unreachable, give up
+# quickly and fall through to MongoDB instead of waiting for the OS timeout
+SOCKET_TIMEOUT_SECONDS = 0.25
+
+# Extended JSON keeps datetimes and ObjectIds intact; decode them as naive UTC like Motor does
+_JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=False)
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """Get the shared Redis client, or None if REDIS_URL is not configured."""
+    redis_url = os.getenv("REDIS_URL")
+    if aioredis is None or not redis_url:
+        return None
+    return aioredis.from_url(
+        redis_url,
+        socket_connect_timeout=SOCKET_TIMEOUT_SECONDS,
+        socket_timeout=SOCKET_TIMEOUT_SECONDS
+    )
+
+
+async def cache_get(key: str) -> Optional[dict]:
+    """Get a cached document, or None on a miss or when Redis is unavailable."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        raw = await client.get(key)
+    except Exception as e:
+        logger.warning("Redis get failed: %s", e)
+        return None
+    return json_util.loads(raw, json_options=_JSON_OPTIONS) if raw else None
+
+
+async def cache_set(key: str, value: dict, ttl: int = DEFAULT_TTL_SECONDS) -> None:
+    """Cache a document for ttl seconds."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.setex(key, ttl, json_util.dumps(value, json_options=_JSON_OPTIONS))
+    except Exception as e:
+        logger.warning("Redis set failed: %s", e)
+
+
+async def cache_delete(*keys: str) -> None:
+    """Drop cached documents after they change."""
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        await client.delete(*keys)
+    except Exception as e:
+        logger.warning("Redis delete failed: %s", e)
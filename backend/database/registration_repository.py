@@ -1,25 +1,71 @@
 """Registration repository for MongoDB operations."""
-from typing import Optional, List
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Optional, List, Union
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 from database.mongodb import MongoDB
 
+logger = logging.getLogger(__name__)
+
+# Indexes behind the registration queries, created by init_db and at app startup.
+# Equality on the owner first, then the sort key, so both listings are served
+# from the index without an in-memory sort.
+REGISTRATION_INDEXES = [
+    [("student_id", 1), ("priority", 1)],
+    [("professor_id", 1), ("created_at", -1)],
+    # Backs has_registration
+    [("professor_id", 1), ("document_id", 1)],
+    # Backs count_accepted_for_professor
+    [("professor_id", 1), ("status", 1)],
+    [("document_id", 1)],
+    [("status", 1)],
+]
+# A student registers one professor per document (built separately: it fails
+# if older data already has duplicates)
+UNIQUE_DOCUMENT_PER_STUDENT_INDEX = [("student_id", 1), ("document_id", 1)]
+
 
 class RegistrationRepository:
     """Repository for registration operations."""
     
+    # Set by ensure_indexes once the unique (student_id, document_id) index exists
+    unique_document_per_student = False
+    
     def __init__(self):
-        self.db = MongoDB.get_database()
-        self.collection = self.db.registrations
+        self.collection = MongoDB.get_collection("registrations")
+        self.db = self.collection.database
+    
+    async def ensure_indexes(self):
+        """Create the indexes behind the registration queries (REGISTRATION_INDEXES)."""
+        await asyncio.gather(*(self.collection.create_index(keys) for keys in REGISTRATION_INDEXES))
+        # Without the unique index (duplicates in older data), callers check with a lookup
+        try:
+            await self.collection.create_index(UNIQUE_DOCUMENT_PER_STUDENT_INDEX, unique=True)
+            self.unique_document_per_student = True
+        except OperationFailure as e:
+            logger.warning("Could not create unique (student_id, document_id) index: %s", e)
     
     async def create_registration(self, registration_data: dict) -> str:
         """Create a new registration."""
-        registration_data['created_at'] = datetime.utcnow()
-        registration_data['updated_at'] = datetime.utcnow()
+        registration_data['created_at'] = registration_data['updated_at'] = datetime.utcnow()
         result = await self.collection.insert_one(registration_data)
         return str(result.inserted_id)
     
-    async def get_registration_by_id(self, registration_id: str) -> Optional[dict]:
+    async def create_many(self, registrations: List[dict]) -> List[str]:
+        """Create several registrations in one round-trip."""
+        if not registrations:
+            return []
+        now = datetime.utcnow()
+        for registration_data in registrations:
+            registration_data['created_at'] = registration_data['updated_at'] = now
+        # ordered=False lets the server insert the rest if one document fails
+        result = await self.collection.insert_many(registrations, ordered=False)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+    
+    async def get_registration_by_id(self, registration_id: Union[str, ObjectId]) -> Optional[dict]:
         """Get registration by ID."""
         reg = await self.collection.find_one({"_id": ObjectId(registration_id)})
         if reg:
@@ -29,27 +75,50 @@ class RegistrationRepository:
     
     async def get_registrations_by_student(self, student_id: str) -> List[dict]:
         """Get all registrations for a student."""
-        cursor = self.collection.find({"student_id": student_id}).sort("priority", 1)
-        registrations = []
-        async for reg in cursor:
-            reg['id'] = str(reg['_id'])
-            del reg['_id']
-            registrations.append(reg)
-        return registrations
+        # The server renames _id to a string id, so rows need no Python-side reshaping
+        cursor = self.collection.aggregate([
+            {"$match": {"student_id": student_id}},
+            {"$sort": {"priority": 1}},
+            {"$addFields": {"id": {"$toString": "$_id"}}},
+            {"$project": {"_id": 0}},
+        ])
+        return await cursor.to_list(length=None)
     
     async def get_registrations_by_professor(self, professor_id: str) -> List[dict]:
         """Get all registrations for a professor."""
-        cursor = self.collection.find({"professor_id": professor_id}).sort("created_at", -1)
-        registrations = []
-        async for reg in cursor:
-            reg['id'] = str(reg['_id'])
-            del reg['_id']
-            registrations.append(reg)
-        return registrations
+        cursor = self.collection.aggregate([
+            {"$match": {"professor_id": professor_id}},
+            {"$sort": {"created_at": -1}},
+            {"$addFields": {"id": {"$toString": "$_id"}}},
+            {"$project": {"_id": 0}},
+        ])
+        return await cursor.to_list(length=None)
+    
+    async def has_registration(self, professor_id: str, document_id: str) -> bool:
+        """Check whether a professor has a registration for a document."""
+        reg = await self.collection.find_one(
+            {"professor_id": professor_id, "document_id": document_id},
+            {"_id": 1}
+        )
+        return reg is not None
+    
+    async def has_student_registration(self, student_id: str, document_id: str) -> bool:
+        """Check whether a student already has a registration for a document."""
+        reg = await self.collection.find_one(
+            {"student_id": student_id, "document_id": document_id},
+            {"_id": 1}
+        )
+        return reg is not None
+    
+    async def count_accepted_for_professor(self, professor_id: str) -> int:
+        """Count a professor's accepted registrations."""
+        return await self.collection.count_documents(
+            {"professor_id": professor_id, "status": "accepted"}
+        )
     
     async def update_registration_status(
         self,
-        registration_id: str,
+        registration_id: Union[str, ObjectId],
         status: str,
         notes: Optional[str] = None
     ) -> bool:
@@ -67,8 +136,13 @@ class RegistrationRepository:
         )
         return result.modified_count > 0
     
-    async def delete_registration(self, registration_id: str) -> bool:
+    async def delete_registration(self, registration_id: Union[str, ObjectId]) -> bool:
         """Delete a registration."""
         result = await self.collection.delete_one({"_id": ObjectId(registration_id)})
         return result.deleted_count > 0
 
+
+@lru_cache(maxsize=None)
+def get_registration_repo() -> RegistrationRepository:
+    """Get the shared RegistrationRepository instance."""
+    return RegistrationRepository()
@@ -1,22 +1,23 @@
 """User repository for MongoDB operations."""
-from typing import Optional, List
+from functools import lru_cache
+from typing import Optional, List, Dict, Iterable
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 from database.mongodb import MongoDB
-from models.user import User, StudentProfile, ProfessorProfile
+from database.redis_cache import cache_delete, cache_get, cache_set
 
 
 class UserRepository:
     """Repository for user operations."""
     
     def __init__(self):
-        self.db = MongoDB.get_database()
-        self.collection = self.db.users
+        self.collection = MongoDB.get_collection("users")
+        self.db = self.collection.database
     
     async def create_user(self, user_data: dict) -> str:
         """Create a new user."""
-        user_data['created_at'] = datetime.utcnow()
-        user_data['updated_at'] = datetime.utcnow()
+        user_data['created_at'] = user_data['updated_at'] = datetime.utcnow()
         result = await self.collection.insert_one(user_data)
         return str(result.inserted_id)
     
@@ -36,6 +37,19 @@ class UserRepository:
             del user['_id']
         return user
     
+    async def get_users_by_ids(
+        self,
+        user_ids: Iterable[str],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, dict]:
+        """Get several users in one query, keyed by string id; invalid ids are skipped."""
+        object_ids = [ObjectId(i) for i in set(user_ids) if ObjectId.is_valid(i)]
+        if not object_ids:
+            return {}
+        projection = dict.fromkeys(fields, 1) if fields else None
+        cursor = self.collection.find({"_id": {"$in": object_ids}}, projection)
+        return {str(doc.pop("_id")): doc async for doc in cursor}
+    
     async def update_user(self, user_id: str, update_data: dict) -> bool:
         """Update user."""
         update_data['updated_at'] = datetime.utcnow()
@@ -45,19 +59,73 @@ class UserRepository:
         )
         return result.modified_count > 0
     
-    async def add_upload_to_student(self, student_id: str, document_id: str) -> bool:
-        """Add upload document ID to student profile."""
+    async def update_user_and_get(self, user_id: str, update_data: dict) -> Optional[dict]:
+        """Update user and return the updated document in the same round-trip."""
+        update_data['updated_at'] = datetime.utcnow()
+        user = await self.collection.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if user:
+            user['id'] = str(user['_id'])
+            del user['_id']
+        return user
+    
+    async def push_fields(self, user_id: str, pushes: Dict[str, str]) -> bool:
+        """Append values to several array fields of a user in one update."""
         result = await self.collection.update_one(
-            {"_id": ObjectId(student_id)},
-            {"$push": {"uploads": document_id}, "$set": {"updated_at": datetime.utcnow()}}
+            {"_id": ObjectId(user_id)},
+            {"$push": pushes, "$set": {"updated_at": datetime.utcnow()}}
         )
         return result.modified_count > 0
     
+    async def add_upload_to_student(self, student_id: str, document_id: str) -> bool:
+        """Add upload document ID to student profile."""
+        return await self.push_fields(student_id, {"uploads": document_id})
+    
     async def add_registration_to_student(self, student_id: str, registration_id: str) -> bool:
         """Add registration ID to student profile."""
-        result = await self.collection.update_one(
-            {"_id": ObjectId(student_id)},
-            {"$push": {"registrations": registration_id}, "$set": {"updated_at": datetime.utcnow()}}
-        )
-        return result.modified_count > 0
+        return await self.push_fields(student_id, {"registrations": registration_id})
+
+
+
+class CachedUserRepository(UserRepository):
+    """UserRepository that caches get_user_by_id in Redis (when configured)."""
+    
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"user:{user_id}"
+    
+    async def get_user_by_id(self, user_id: str) -> Optional[dict]:
+        """Get user by ID, from the cache when possible."""
+        user = await cache_get(self._key(user_id))
+        if user is None:
+            user = await super().get_user_by_id(user_id)
+            if user:
+                await cache_set(self._key(user_id), user)
+        return user
+    
+    async def update_user(self, user_id: str, update_data: dict) -> bool:
+        """Update user and drop the cached copy."""
+        result = await super().update_user(user_id, update_data)
+        await cache_delete(self._key(user_id))
+        return result
+    
+    async def update_user_and_get(self, user_id: str, update_data: dict) -> Optional[dict]:
+        """Update user, drop the cached copy and return the updated document."""
+        user = await super().update_user_and_get(user_id, update_data)
+        await cache_delete(self._key(user_id))
+        return user
+    
+    async def push_fields(self, user_id: str, pushes: Dict[str, str]) -> bool:
+        """Append to a user's array fields and drop the cached copy."""
+        result = await super().push_fields(user_id, pushes)
+        await cache_delete(self._key(user_id))
+        return result
+
 
+@lru_cache(maxsize=None)
+def get_user_repo() -> UserRepository:
+    """Get the shared (cached) user repository."""
+    return CachedUserRepository()
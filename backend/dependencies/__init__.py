@@ -0,0 +1 @@
+# Dependencies package
@@ -0,0 +1,72 @@
+"""Request-scoped current user, loaded at most once per request."""
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from database.professor_profile_repository import get_profile_repo
+from database.user_repository import get_user_repo
+
+logger = logging.getLogger(__name__)
+
+# Marks the professor profile as not fetched yet (None means "has no profile")
+_NOT_LOADED = object()
+
+
+@dataclass
+class CurrentUser:
+    """The authenticated user of a request and their lazily loaded profile."""
+    user_id: str
+    user: Optional[dict]
+    _profile: object = field(default=_NOT_LOADED, repr=False)
+
+    @property
+    def role(self) -> Optional[str]:
+        """Role of the user, or None if the user does not exist."""
+        return self.user.get("role") if self.user else None
+
+    async def get_profile(self) -> Optional[dict]:
+        """Get the user's professor profile, querying MongoDB only the first time."""
+        if self._profile is _NOT_LOADED:
+            self._profile = await get_profile_repo().get_profile_by_user_id(self.user_id)
+        return self._profile
+
+    async def get_professor_profile_id(self) -> Optional[str]:
+        """
+        ID that registrations use for this professor (their profile ID).
+
+        Returns None if the professor has no profile. If the profile lookup
+        fails, falls back to the user ID, which older registrations used.
+        """
+        try:
+            profile = await self.get_profile()
+        except Exception as e:
+            logger.warning("Error getting professor profile: %s", e)
+            return self.user_id
+        return profile.get("id") if profile else None
+
+
+async def get_current_user_id(request: Request) -> str:
+    """Get current user ID from the X-User-Id header (or user_id query param)."""
+    user_id = request.headers.get("X-User-Id") or request.query_params.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized. Please provide X-User-Id header.")
+    return user_id
+
+
+async def get_current_user(
+    request: Request,
+    user_id: str = Depends(get_current_user_id)
+) -> CurrentUser:
+    """
+    Resolve the current user once per request.
+
+    The result is kept on request.state, so every dependency and handler of
+    the same request shares one user lookup (and one profile lookup).
+    """
+    current_user = getattr(request.state, "current_user", None)
+    if current_user is not None:
+        return current_user
+
+    current_user = CurrentUser(user_id=user_id, user=await get_user_repo().get_user_by_id(user_id))
+    request.state.current_user = current_user
+    return current_user
@@ -0,0 +1,17 @@
+"""Parsing of MongoDB ObjectId values coming from requests."""
+from functools import lru_cache
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+@lru_cache(maxsize=1024)
+def parse_object_id(value: str) -> ObjectId:
+    """
+    Parse an ObjectId once where the request enters.
+    
+    Malformed ids return a 400 instead of failing later inside the driver.
+    """
+    # is_valid rejects bad input without raising and catching InvalidId
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    return ObjectId(value)
@@ -1,30 +1,65 @@
 """Main FastAPI application for professor matching system."""
+import asyncio
+import logging
 import os
 from typing import List, Optional
 from datetime import datetime
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel
 
 # Only import uvicorn when not in serverless environment
 if not os.getenv("VERCEL") and not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
     import uvicorn
+    logging.basicConfig(level=logging.INFO)
+else:
+    # Log output is shipped to log storage on every cold start; keep it to warnings
+    logging.basicConfig(level=logging.WARNING)
+
+logger = logging.getLogger(__name__)
 
 from services.matching import MatchingService
-from services.document_processor import DocumentProcessor
+from services.document_processor import (
+    ALLOWED_EXTENSIONS,
+    UNSUPPORTED_FILE_TYPE_MESSAGE,
+    DocumentProcessor,
+    get_file_size,
+)
+from services.s3_service import S3Service
+from services.summarizer import DocumentSummarizer
 from database.professors import ProfessorDatabase
 from database.mongodb import MongoDB
+from database.document_repository import get_document_repo
+from database.registration_repository import get_registration_repo
+from database.user_repository import get_user_repo
 from routers import users, documents, registrations, notifications
 try:
     from routers import professor_profile
 except ImportError:
     professor_profile = None
 
+# Use uvloop for the event loop when available (Linux); Motor's socket I/O
+# is scheduled through the loop, so a faster loop speeds up every DB await
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+# Serialize response bodies with orjson when it is installed. FastAPI runs
+# jsonable_encoder first, so ObjectId/datetime values arrive as plain JSON types.
+try:
+    import orjson  # noqa: F401
+    default_response_class = ORJSONResponse
+except ImportError:
+    default_response_class = JSONResponse
+
 app = FastAPI(
     title="Hạnh Matching API",
     description="Hệ thống đề xuất giảng viên phù hợp cho bài báo cáo",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=default_response_class
 )
 
 # CORS middleware
@@ -50,36 +85,78 @@ except ValueError as e:
 document_processor = DocumentProcessor()
 professor_db = ProfessorDatabase()
 
+# S3 and the summarizer are optional for upload-and-match; build them once
+try:
+    s3_service = S3Service()
+except Exception as e:
+    print(f"Warning: S3 service not available: {e}")
+    s3_service = None
+
+try:
+    summarizer = DocumentSummarizer()
+except Exception as e:
+    print(f"Warning: Summarizer not available: {e}")
+    summarizer = None
+
 # Initialize MongoDB (optional)
 try:
     db = MongoDB.get_database()  # Test connection
     # Test connection asynchronously
-    import asyncio
     async def test_connection():
         try:
             await db.command('ping')
-            print("MongoDB connected successfully")
+            logger.debug("MongoDB connected successfully")
         except Exception as e:
-            print(f"MongoDB connection test failed: {e}")
+            logger.warning("MongoDB connection test failed: %s", e)
             raise
     
     try:
         loop = asyncio.get_event_loop()
         if loop.is_running():
             # If loop is already running, connection will be tested on first use
-            print("MongoDB client initialized (connection will be tested on first use)")
+            logger.debug("MongoDB client initialized (connection will be tested on first use)")
         else:
             loop.run_until_complete(test_connection())
     except Exception as e:
-        print(f"Warning: MongoDB connection issue: {e}")
-        print("MongoDB will be attempted on first use")
+        logger.warning("MongoDB connection issue, will retry on first use: %s", e)
     
     # Collections will be created automatically on first insert
     # No need to pre-create them
 except Exception as e:
-    print(f"Warning: MongoDB not available: {e}")
-    print("Some features will not work without MongoDB")
-    print("Make sure MONGODB_URI is set correctly in .env file")
+    logger.warning(
+        "MongoDB not available, some features will not work "
+        "(make sure MONGODB_URI is set correctly in .env file): %s", e
+    )
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Create the indexes the hot registration queries rely on."""
+    try:
+        await get_registration_repo().ensure_indexes()
+    except Exception as e:
+        logger.warning("Could not create registration indexes: %s", e)
+
+
+@app.on_event("startup")
+async def load_professor_embeddings():
+    """Load professor embeddings and the chat tokenizer before serving, so no request pays for them."""
+    if matching_service is None:
+        return
+    try:
+        await asyncio.gather(
+            matching_service.ensure_professor_embeddings(),
+            matching_service.ensure_chat_encoding()
+        )
+    except Exception as e:
+        logger.warning("Could not load professor embeddings: %s", e)
+    # Serverless instances are frozen between requests, so only long-running
+    # servers keep a refresh loop
+    if not os.getenv("VERCEL") and not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        # Keep a reference so the task is not garbage collected
+        app.state.professor_refresh_task = asyncio.create_task(
+            matching_service.refresh_professor_embeddings_periodically()
+        )
+
 
 # Register routers
 app.include_router(users.router)
@@ -110,10 +187,14 @@ async def health_check():
 
 
 @app.get("/api/professors")
-async def get_professors():
+async def get_professors(request: Request):
     """Get all professors."""
-    professors = professor_db.get_all_professors()
-    return {"professors": professors, "count": len(professors)}
+    # The listing only changes through add_professor, so serve the cached body
+    body, etag = professor_db.get_professors_json()
+    headers = {"ETag": etag}
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.post("/api/upload")
@@ -121,20 +202,16 @@ async def upload_report(file: UploadFile = File(...)):
     """Upload and process student report."""
     try:
         # Validate file type
-        allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
         file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail=f"File type not supported. Allowed: {', '.join(allowed_extensions)}"
+                detail=UNSUPPORTED_FILE_TYPE_MESSAGE
             )
         
-        # Read file content
-        contents = await file.read()
-        
-        # Process document
-        text = await document_processor.process_file(contents, file_ext)
+        # Parse the spooled upload in place instead of reading it into memory
+        text = await document_processor.process_file(file.file, file_ext)
         
         return {
             "success": True,
@@ -147,6 +224,20 @@ async def upload_report(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def check_match_text(text: str):
+    """Reject texts too short to match professors against."""
+    if not text or len(text.strip()) < 50:
+        raise HTTPException(
+            status_code=400,
+            detail="Text must be at least 50 characters long"
+        )
+
+
+def text_preview(text: str) -> str:
+    """First 200 characters of a matched text, for the response."""
+    return text[:200] + "..." if len(text) > 200 else text
+
+
 @app.post("/api/match", response_model=MatchResponse)
 async def match_professors(request: MatchRequest):
     """Match professors based on report text."""
@@ -157,11 +248,7 @@ async def match_professors(request: MatchRequest):
                 detail="Matching service is not available. Please set OPENAI_API_KEY environment variable."
             )
         
-        if not request.text or len(request.text.strip()) < 50:
-            raise HTTPException(
-                status_code=400,
-                detail="Text must be at least 50 characters long"
-            )
+        check_match_text(request.text)
         
         # Find matches
         matches = await matching_service.find_matches(
@@ -172,7 +259,7 @@ async def match_professors(request: MatchRequest):
         
         return MatchResponse(
             matches=matches,
-            processed_text=request.text[:200] + "..." if len(request.text) > 200 else request.text
+            processed_text=text_preview(request.text)
         )
     
     except HTTPException:
@@ -181,6 +268,11 @@ async def match_professors(request: MatchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _skipped(reason: str):
+    """Stand-in for an optional upload-and-match step that cannot run."""
+    raise ValueError(reason)
+
+
 @app.post("/api/upload-and-match")
 async def upload_and_match(
     request: Request,
@@ -199,27 +291,25 @@ async def upload_and_match(
         # Get user ID from header (set by frontend)
         user_id = request.headers.get("X-User-Id")
         google_id = request.headers.get("X-Google-Id")
-        # Debug: Log user_id
-        print(f"DEBUG: Received X-User-Id header: {user_id}")
-        print(f"DEBUG: Received X-Google-Id header: {google_id}")
+        logger.debug("Received X-User-Id header: %s", user_id)
+        logger.debug("Received X-Google-Id header: %s", google_id)
         
         # If no MongoDB user_id, use Google ID as fallback
         # This allows the system to work even if MongoDB is not available
         if not user_id and google_id:
             user_id = google_id  # Use Google ID as temporary user_id
-            print(f"DEBUG: Using Google ID as user_id: {user_id}")
+            logger.debug("Using Google ID as user_id: %s", user_id)
         
         # Try to get MongoDB user_id from Google ID if we have it
         if google_id and user_id == google_id:
             try:
-                from database.user_repository import UserRepository
-                user_repo = UserRepository()
+                user_repo = get_user_repo()
                 user = await user_repo.get_user_by_google_id(google_id)
                 if user:
                     user_id = user.get("id")
-                    print(f"DEBUG: Found MongoDB user_id from Google ID: {user_id}")
+                    logger.debug("Found MongoDB user_id from Google ID: %s", user_id)
             except Exception as e:
-                print(f"DEBUG: Could not get MongoDB user from Google ID (will use Google ID): {e}")
+                logger.debug("Could not get MongoDB user from Google ID (will use Google ID): %s", e)
                 # Continue with Google ID as fallback
         
         # Validate file
@@ -231,68 +321,80 @@ async def upload_and_match(
         file_ext = os.path.splitext(file.filename)[1].lower()
         
         # Validate file type
-        allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail=f"File type not supported. Allowed: {', '.join(allowed_extensions)}"
+                detail=UNSUPPORTED_FILE_TYPE_MESSAGE
             )
         
-        contents = await file.read()
-        file_size = len(contents)
+        # Work on the spooled upload directly instead of reading it into memory
+        file_size = get_file_size(file.file)
         
         # Process document to extract text
-        text = await document_processor.process_file(contents, file_ext)
+        text = await document_processor.process_file(file.file, file_ext)
         
-        # Match professors
-        match_request = MatchRequest(
-            text=text, 
-            top_k=top_k,
-            include_analysis=include_analysis
-        )
-        match_result = await match_professors(match_request)
+        # Match professors (same guard as /api/match, without re-entering the handler)
+        check_match_text(text)
         
-        # Validate match_result
-        if not match_result or not hasattr(match_result, 'matches'):
-            raise HTTPException(status_code=500, detail="Failed to get match results")
+        # Matching, the S3 upload and the AI summary are independent I/O waits,
+        # so run them concurrently. S3 and the summary are only needed to save
+        # the document, i.e. when a user_id is known.
+        if user_id and s3_service is not None:
+            file.file.seek(0)
+            s3_upload = asyncio.to_thread(
+                s3_service.upload_file,
+                file_content=file.file,
+                filename=file.filename,
+                user_id=user_id,
+                file_type=file_ext[1:]
+            )
+        else:
+            s3_upload = _skipped("S3 service is not configured")
+        if user_id and summarizer is not None:
+            summarize = summarizer.summarize_document(text)
+        else:
+            summarize = _skipped("Summarizer is not configured")
+        
+        s3_task = asyncio.ensure_future(s3_upload)
+        summary_task = asyncio.ensure_future(summarize)
+        try:
+            matches = await matching_service.find_matches(
+                text=text,
+                top_k=top_k,
+                include_analysis=include_analysis
+            )
+        except Exception:
+            # No document will be saved: drop the summary and the uploaded file
+            summary_task.cancel()
+            s3_result, _ = await asyncio.gather(s3_task, summary_task, return_exceptions=True)
+            if not isinstance(s3_result, BaseException):
+                await asyncio.to_thread(s3_service.delete_file, s3_result[1])
+            raise
+        s3_result, summary_result = await asyncio.gather(s3_task, summary_task, return_exceptions=True)
         
         # If user_id is provided and MongoDB is available, save document
         document_id = None
         if user_id:
             try:
-                from database.document_repository import DocumentRepository
-                from database.user_repository import UserRepository
+                doc_repo = get_document_repo()
+                user_repo = get_user_repo()
                 
-                doc_repo = DocumentRepository()
-                user_repo = UserRepository()
-                
-                # Upload to S3 if available
+                # S3 upload is not critical - continue without it
                 s3_url = None
                 s3_key = None
-                try:
-                    from services.s3_service import S3Service
-                    s3_service = S3Service()
-                    s3_url, s3_key = s3_service.upload_file(
-                        file_content=contents,
-                        filename=file.filename,
-                        user_id=user_id,
-                        file_type=file_ext[1:]
-                    )
-                    print(f"DEBUG: Uploaded to S3: {s3_url}")
-                except Exception as e:
-                    print(f"Warning: S3 upload failed (continuing without S3): {e}")
-                    # Continue without S3 - not critical
+                if isinstance(s3_result, Exception):
+                    logger.warning("S3 upload failed (continuing without S3): %s", s3_result)
+                else:
+                    s3_url, s3_key = s3_result
+                    logger.debug("Uploaded to S3: %s", s3_url)
                 
-                # Generate AI summary
+                # AI summary is optional too
                 summary = None
-                try:
-                    from services.summarizer import DocumentSummarizer
-                    summarizer = DocumentSummarizer()
-                    summary = await summarizer.summarize_document(text)
-                    print(f"DEBUG: ✅ Generated document summary")
-                except Exception as e:
-                    print(f"Warning: Could not generate summary: {e}")
-                    # Continue without summary
+                if isinstance(summary_result, Exception):
+                    logger.warning("Could not generate summary: %s", summary_result)
+                else:
+                    summary = summary_result
+                    logger.debug("Generated document summary")
                 
                 # Save to MongoDB (even without S3)
                 document_data = {
@@ -307,47 +409,40 @@ async def upload_and_match(
                     "summary": summary,
                     "summary_created_at": datetime.utcnow().isoformat() if summary else None
                 }
+                # Insert first: the user's uploads list must only reference saved documents
                 document_id = await doc_repo.create_document(document_data)
-                print(f"DEBUG: ✅ Created document in MongoDB: {document_id}")
+                logger.debug("Created document in MongoDB: %s", document_id)
                 
                 # Try to add to user's uploads (may fail if user doesn't exist yet)
                 try:
                     await user_repo.add_upload_to_student(user_id, document_id)
-                    print(f"DEBUG: ✅ Added document to user's uploads list")
+                    logger.debug("Added document to user's uploads list")
                 except Exception as e:
-                    print(f"Warning: Could not add to user uploads (user may not exist yet): {e}")
+                    logger.warning("Could not add to user uploads (user may not exist yet): %s", e)
                     # Continue anyway - document is saved
                     
             except Exception as e:
-                print(f"ERROR: Failed to save document to database: {e}")
-                import traceback
-                traceback.print_exc()
                 # Don't fail the whole request - return matches anyway
-                print("Continuing without saving document to database")
+                logger.exception(
+                    "Failed to save document to database, continuing without it: %s", e
+                )
         else:
-            print(f"DEBUG: ⚠️ No user_id provided, skipping document save")
-            print(f"DEBUG: Headers received: {dict(request.headers)}")
-        
-        # Ensure matches is a list
-        matches_list = match_result.matches if match_result and hasattr(match_result, 'matches') else []
-        if not isinstance(matches_list, list):
-            matches_list = []
+            logger.debug("No user_id provided, skipping document save")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Headers received: %s", dict(request.headers))
         
         return {
             "success": True,
             "filename": file.filename or "unknown",
-            "matches": matches_list,
-            "text_preview": match_result.processed_text if match_result and hasattr(match_result, 'processed_text') else text[:200] if text else "",
+            "matches": matches,
+            "text_preview": text_preview(text),
             "document_id": document_id
         }
     
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        error_traceback = traceback.format_exc()
-        print(f"❌ ERROR in upload_and_match: {str(e)}")
-        print(f"Traceback:\n{error_traceback}")
+        logger.exception("Error in upload_and_match: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
@@ -1,27 +1,26 @@
 """Authentication middleware to extract user from session."""
 from fastapi import Request, HTTPException
+from functools import lru_cache
 from typing import Optional
 import jwt
 import os
 
 
-async def get_user_from_request(request: Request) -> Optional[str]:
+def get_user_from_request(request: Request) -> Optional[str]:
     """
     Extract user ID from request.
     In production, this should verify JWT token from NextAuth session.
     For now, we'll use a header or query parameter.
     """
-    # Try to get from header (set by frontend after login)
-    user_id = request.headers.get("X-User-Id")
-    if user_id:
-        return user_id
-    
-    # Try to get from query parameter
-    user_id = request.query_params.get("user_id")
-    if user_id:
-        return user_id
-    
-    return None
+    # Header first (set by frontend after login); query_params is only
+    # parsed when the header is missing
+    return request.headers.get("X-User-Id") or request.query_params.get("user_id")
+
+
+@lru_cache(maxsize=1)
+def _nextauth_secret() -> Optional[str]:
+    """Read NEXTAUTH_SECRET once; it does not change while the process runs."""
+    return os.getenv("NEXTAUTH_SECRET")
 
 
 def verify_nextauth_token(token: str) -> Optional[dict]:
@@ -30,13 +29,22 @@ def verify_nextauth_token(token: str) -> Optional[dict]:
     This is a placeholder - in production, verify against NextAuth secret.
     """
     try:
-        secret = os.getenv("NEXTAUTH_SECRET")
+        secret = _nextauth_secret()
         if not secret:
             return None
         
-        # Decode token (NextAuth uses HS256)
-        payload = jwt.decode(token, secret, algorithms=["HS256"])
+        # A JWS has exactly three dot-separated parts; reject anything else
+        # without going through the decoder
+        if not token or token.count(".") != 2:
+            return None
+        
+        # Decode token (NextAuth uses HS256); NextAuth sets no audience
+        payload = jwt.decode(
+            token,
+            secret,
+            algorithms=["HS256"],
+            options={"verify_aud": False}
+        )
         return payload
     except Exception:
         return None
-
@@ -1,7 +1,7 @@
 """Document upload model."""
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from bson import ObjectId
 from models.user import PyObjectId
 
@@ -19,7 +19,7 @@ class Document(BaseModel):
     extracted_text: str
     summary: Optional[str] = None  # AI-generated summary
     summary_created_at: Optional[datetime] = None
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
     
     model_config = {
         "arbitrary_types_allowed": True,
@@ -35,7 +35,7 @@ class MatchResult(BaseModel):
     similarity_score: float
     match_percentage: float
     analysis: Optional[str] = None
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
         arbitrary_types_allowed = True
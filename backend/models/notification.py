@@ -1,39 +1,41 @@
 """Notification model."""
-from typing import Optional
+from typing import ClassVar, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
+from pydantic_core import core_schema
 from bson import ObjectId
 
 
 class PyObjectId(ObjectId):
     """Custom ObjectId for Pydantic v2 compatibility."""
     
+    # The core schema never changes, so build it once and hand back the same object
+    _cached_schema: ClassVar[Optional[core_schema.CoreSchema]] = None
+    
     @classmethod
     def __get_pydantic_core_schema__(cls, source_type, handler):
-        from pydantic_core import core_schema
-        return core_schema.json_or_python_schema(
-            json_schema=core_schema.str_schema(),
-            python_schema=core_schema.union_schema([
-                core_schema.is_instance_schema(ObjectId),
-                core_schema.chain_schema([
-                    core_schema.str_schema(),
-                    core_schema.no_info_plain_validator_function(cls._validate),
-                ])
-            ]),
-            serialization=core_schema.plain_serializer_function_ser_schema(
-                lambda x: str(x)
-            ),
-        )
+        if cls._cached_schema is None:
+            cls._cached_schema = core_schema.json_or_python_schema(
+                json_schema=core_schema.str_schema(),
+                python_schema=core_schema.union_schema([
+                    core_schema.is_instance_schema(ObjectId),
+                    core_schema.chain_schema([
+                        core_schema.str_schema(),
+                        core_schema.no_info_plain_validator_function(cls._validate),
+                    ])
+                ]),
+                serialization=core_schema.plain_serializer_function_ser_schema(
+                    lambda x: str(x)
+                ),
+            )
+        return cls._cached_schema
     
     @classmethod
     def _validate(cls, value):
         if isinstance(value, ObjectId):
             return value
-        if isinstance(value, str):
-            try:
-                return ObjectId(value)
-            except Exception:
-                raise ValueError("Invalid ObjectId")
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            return ObjectId(value)
         raise ValueError("Invalid ObjectId")
 
 
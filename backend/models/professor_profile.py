@@ -1,7 +1,7 @@
 """Professor profile model."""
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, Field
+from typing import Optional, List, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
 from bson import ObjectId
 from models.user import PyObjectId
 
@@ -27,35 +27,44 @@ class ProfessorProfile(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # (updated_at, text) of the last generate_profile_text call
+    _profile_text_cache: Optional[Tuple[datetime, str]] = PrivateAttr(default=None)
+    
+    # Read models: immutable, and passed into other models as-is (no revalidation or copy)
     model_config = {
         "arbitrary_types_allowed": True,
-        "json_encoders": {ObjectId: str}
+        "json_encoders": {ObjectId: str},
+        "frozen": True,
+        "revalidate_instances": "never",
+        "extra": "ignore"
     }
     
     def generate_profile_text(self) -> str:
-        """Generate combined text for embedding."""
+        """Generate combined text for embedding (cached until updated_at changes)."""
+        cached = self._profile_text_cache
+        if cached is not None and cached[0] == self.updated_at:
+            return cached[1]
+        
         parts = [
             f"Tên: {self.name}",
             f"Chức danh: {self.title}",
             f"Khoa/Bộ môn: {self.department}",
         ]
-        
+        # Only format the optional lines that are actually present
         if self.bio:
             parts.append(f"Tiểu sử: {self.bio}")
-        
         if self.research_interests:
             parts.append(f"Lĩnh vực nghiên cứu: {', '.join(self.research_interests)}")
-        
         if self.expertise_areas:
             parts.append(f"Chuyên môn: {', '.join(self.expertise_areas)}")
-        
         if self.education:
             parts.append(f"Học vấn: {self.education}")
-        
         if self.publications:
             parts.append(f"Công trình nghiên cứu: {self.publications}")
         
-        return "\n".join(parts)
+        text = "\n".join(parts)
+        self._profile_text_cache = (self.updated_at, text)
+        return text
     
     def check_completeness(self) -> bool:
         """Check if profile is complete enough for matching."""
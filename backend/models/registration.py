@@ -1,7 +1,7 @@
 """Registration model for student professor preferences."""
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from bson import ObjectId
 from models.user import PyObjectId
 
@@ -15,8 +15,8 @@ class Registration(BaseModel):
     priority: int  # 1 = first choice, 2 = second choice, etc.
     status: str = "pending"  # pending, accepted, rejected
     notes: Optional[str] = None
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     model_config = {
         "arbitrary_types_allowed": True,
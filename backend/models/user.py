@@ -1,7 +1,7 @@
 """User model for MongoDB."""
 from datetime import datetime
-from typing import Optional, List, Any
-from pydantic import BaseModel, EmailStr, GetJsonSchemaHandler
+from typing import Any, ClassVar, List, Optional
+from pydantic import BaseModel, Field, GetJsonSchemaHandler
 from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import core_schema
 from bson import ObjectId
@@ -10,23 +10,28 @@ from bson import ObjectId
 class PyObjectId(ObjectId):
     """Custom ObjectId for Pydantic v2."""
     
+    # The core schema never changes, so build it once and hand back the same object
+    _cached_schema: ClassVar[Optional[core_schema.CoreSchema]] = None
+    
     @classmethod
     def __get_pydantic_core_schema__(
         cls, source_type: Any, handler
     ) -> core_schema.CoreSchema:
-        return core_schema.json_or_python_schema(
-            json_schema=core_schema.str_schema(),
-            python_schema=core_schema.union_schema([
-                core_schema.is_instance_schema(ObjectId),
-                core_schema.chain_schema([
-                    core_schema.str_schema(),
-                    core_schema.no_info_plain_validator_function(cls.validate),
-                ])
-            ]),
-            serialization=core_schema.plain_serializer_function_ser_schema(
-                lambda x: str(x)
-            ),
-        )
+        if cls._cached_schema is None:
+            cls._cached_schema = core_schema.json_or_python_schema(
+                json_schema=core_schema.str_schema(),
+                python_schema=core_schema.union_schema([
+                    core_schema.is_instance_schema(ObjectId),
+                    core_schema.chain_schema([
+                        core_schema.str_schema(),
+                        core_schema.no_info_plain_validator_function(cls.validate),
+                    ])
+                ]),
+                serialization=core_schema.plain_serializer_function_ser_schema(
+                    lambda x: str(x)
+                ),
+            )
+        return cls._cached_schema
     
     @classmethod
     def validate(cls, v):
@@ -46,19 +51,23 @@ class PyObjectId(ObjectId):
 
 
 class User(BaseModel):
-    """User model."""
+    """User model as stored in MongoDB."""
     id: Optional[str] = None  # Store as string (MongoDB ObjectId converted to string)
     google_id: str  # Google OAuth ID
-    email: EmailStr
+    email: str
     name: str
     role: str  # 'student' or 'professor'
     avatar_url: Optional[str] = None
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Read models: immutable, and passed into other models as-is (no revalidation or copy)
     model_config = {
         "arbitrary_types_allowed": True,
-        "json_encoders": {ObjectId: str}
+        "json_encoders": {ObjectId: str},
+        "frozen": True,
+        "revalidate_instances": "never",
+        "extra": "ignore"
     }
 
 
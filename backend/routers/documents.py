@@ -1,16 +1,25 @@
 """Document routes."""
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Request
+import asyncio
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
 from typing import List, Optional
-from datetime import datetime
-from services.document_processor import DocumentProcessor
+from services.document_processor import (
+    ALLOWED_EXTENSIONS,
+    UNSUPPORTED_FILE_TYPE_MESSAGE,
+    DocumentProcessor,
+    get_file_size,
+)
 from services.s3_service import S3Service
-from database.document_repository import DocumentRepository
-from database.user_repository import UserRepository
+from database.document_repository import get_document_repo
+from database.registration_repository import get_registration_repo
+from database.user_repository import get_user_repo
+from dependencies.current_user import CurrentUser, get_current_user, get_current_user_id
+from dependencies.ids import parse_object_id
 import os
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
-document_repo = DocumentRepository()
-user_repo = UserRepository()
+document_repo = get_document_repo()
+registration_repo = get_registration_repo()
+user_repo = get_user_repo()
 document_processor = DocumentProcessor()
 
 # Initialize S3 service (optional, will fail gracefully if not configured)
@@ -21,18 +30,6 @@ except Exception as e:
     s3_service = None
 
 
-async def get_current_user_id(request: Request) -> str:
-    """Get current user ID from request."""
-    # Try to get from header
-    user_id = request.headers.get("X-User-Id")
-    if not user_id:
-        # Try from query param (for testing)
-        user_id = request.query_params.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized. Please provide X-User-Id header.")
-    return user_id
-
-
 @router.post("/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -41,29 +38,30 @@ async def upload_document(
     """Upload a document and save to S3 + MongoDB."""
     try:
         # Validate file type
-        allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
         file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail=f"File type not supported. Allowed: {', '.join(allowed_extensions)}"
+                detail=UNSUPPORTED_FILE_TYPE_MESSAGE
             )
         
-        # Read file content
-        contents = await file.read()
-        file_size = len(contents)
+        # Work on the spooled upload directly instead of reading it into memory
+        file_size = get_file_size(file.file)
         
         # Extract text
-        text = await document_processor.process_file(contents, file_ext)
+        text = await document_processor.process_file(file.file, file_ext)
         
         # Upload to S3 if available
         s3_url = None
         s3_key = None
         if s3_service:
             try:
-                s3_url, s3_key = s3_service.upload_file(
-                    file_content=contents,
+                file.file.seek(0)
+                # boto3 blocks; keep the event loop free while the upload runs
+                s3_url, s3_key = await asyncio.to_thread(
+                    s3_service.upload_file,
+                    file_content=file.file,
                     filename=file.filename,
                     user_id=user_id,
                     file_type=file_ext[1:]  # Remove the dot
@@ -84,6 +82,7 @@ async def upload_document(
             "extracted_text": text
         }
         
+        # Insert first: the user's uploads list must only reference saved documents
         document_id = await document_repo.create_document(document_data)
         
         # Add to user's uploads
@@ -118,20 +117,20 @@ async def get_my_documents_me(user_id: str = Depends(get_current_user_id)):
 
 
 @router.get("/{document_id}")
-async def get_document(document_id: str, user_id: str = Depends(get_current_user_id)):
+async def get_document(document_id: str, current_user: CurrentUser = Depends(get_current_user)):
     """Get a specific document."""
     # Prevent "me" from being treated as document_id
     if document_id == "me":
         raise HTTPException(status_code=400, detail="Use /api/documents/me to get your documents")
     
-    document = await document_repo.get_document_by_id(document_id)
+    document = await document_repo.get_document_by_id(parse_object_id(document_id))
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Check access: student can only see their own documents
     # Professor can see documents if they have a registration for it
-    user = await user_repo.get_user_by_id(user_id)
-    user_role = user.get("role") if user else None
+    user_id = current_user.user_id
+    user_role = current_user.role
     
     if user_role == "student":
         # Students can only see their own documents
@@ -140,19 +139,12 @@ async def get_document(document_id: str, user_id: str = Depends(get_current_user
     elif user_role == "professor":
         # Professors can see documents if they have a registration for it
         try:
-            from database.registration_repository import RegistrationRepository
-            from database.professor_profile_repository import ProfessorProfileRepository
-            
-            registration_repo = RegistrationRepository()
-            profile_repo = ProfessorProfileRepository()
-            
             # Get professor's profile ID
-            profile = await profile_repo.get_profile_by_user_id(user_id)
+            profile = await current_user.get_profile()
             if profile:
                 profile_id = profile.get("id")
                 # Check if there's a registration for this document and professor
-                registrations = await registration_repo.get_registrations_by_professor(profile_id)
-                has_access = any(reg.get("document_id") == document_id for reg in registrations)
+                has_access = await registration_repo.has_registration(profile_id, document_id)
                 
                 if not has_access:
                     raise HTTPException(status_code=403, detail="Access denied. You don't have a registration for this document.")
@@ -166,30 +158,26 @@ async def get_document(document_id: str, user_id: str = Depends(get_current_user
     else:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Convert ObjectId to string for JSON serialization
-    result = {}
-    for key, value in document.items():
-        if hasattr(value, '__class__') and value.__class__.__name__ == 'ObjectId':
-            result[key] = str(value)
-        elif isinstance(value, datetime):
-            result[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-        else:
-            result[key] = value
-    
-    return result
+    # get_document_by_id already turns _id into a string id; the remaining fields
+    # are strings, numbers and datetimes, which the response encoder handles
+    return document
 
 
 @router.get("/{document_id}/download")
-async def get_document_download_url(document_id: str, user_id: str = Depends(get_current_user_id)):
+async def get_document_download_url(document_id: str, current_user: CurrentUser = Depends(get_current_user)):
     """Get presigned URL for document download."""
-    document = await document_repo.get_document_by_id(document_id)
+    # Only the access check and the presigned URL fields are needed, not extracted_text
+    document = await document_repo.get_document_by_id(
+        parse_object_id(document_id),
+        fields=["user_id", "s3_key", "filename"]
+    )
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Check access: student can only see their own documents
     # Professor can see documents if they have a registration for it
-    user = await user_repo.get_user_by_id(user_id)
-    user_role = user.get("role") if user else None
+    user_id = current_user.user_id
+    user_role = current_user.role
     
     if user_role == "student":
         # Students can only see their own documents
@@ -198,19 +186,12 @@ async def get_document_download_url(document_id: str, user_id: str = Depends(get
     elif user_role == "professor":
         # Professors can see documents if they have a registration for it
         try:
-            from database.registration_repository import RegistrationRepository
-            from database.professor_profile_repository import ProfessorProfileRepository
-            
-            registration_repo = RegistrationRepository()
-            profile_repo = ProfessorProfileRepository()
-            
             # Get professor's profile ID
-            profile = await profile_repo.get_profile_by_user_id(user_id)
+            profile = await current_user.get_profile()
             if profile:
                 profile_id = profile.get("id")
                 # Check if there's a registration for this document and professor
-                registrations = await registration_repo.get_registrations_by_professor(profile_id)
-                has_access = any(reg.get("document_id") == document_id for reg in registrations)
+                has_access = await registration_repo.has_registration(profile_id, document_id)
                 
                 if not has_access:
                     raise HTTPException(status_code=403, detail="Access denied. You don't have a registration for this document.")
@@ -247,7 +228,8 @@ async def get_document_download_url(document_id: str, user_id: str = Depends(get
 @router.delete("/{document_id}")
 async def delete_document(document_id: str, user_id: str = Depends(get_current_user_id)):
     """Delete a document."""
-    document = await document_repo.get_document_by_id(document_id)
+    document_oid = parse_object_id(document_id)
+    document = await document_repo.get_document_by_id(document_oid, fields=["user_id", "s3_key"])
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -257,9 +239,9 @@ async def delete_document(document_id: str, user_id: str = Depends(get_current_u
     
     # Delete from S3 if exists
     if s3_service and document.get("s3_key"):
-        s3_service.delete_file(document["s3_key"])
+        await asyncio.to_thread(s3_service.delete_file, document["s3_key"])
     
     # Delete from MongoDB
-    success = await document_repo.delete_document(document_id)
+    success = await document_repo.delete_document(document_oid)
     return {"success": success}
 
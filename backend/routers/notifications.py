@@ -1,27 +1,18 @@
 """Notification routes."""
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends
 from typing import List
-from database.notification_repository import NotificationRepository
+from database.notification_repository import get_notification_repo
+from dependencies.current_user import get_current_user_id
+from dependencies.ids import parse_object_id
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
-notification_repo = NotificationRepository()
-
-
-async def get_current_user_id(request: Request) -> str:
-    """Get current user ID from request."""
-    user_id = request.headers.get("X-User-Id")
-    if not user_id:
-        user_id = request.query_params.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized. Please provide X-User-Id header.")
-    return user_id
+notification_repo = get_notification_repo()
 
 
 @router.get("/")
 async def get_my_notifications(user_id: str = Depends(get_current_user_id)):
     """Get all notifications for current user."""
-    notifications = await notification_repo.get_notifications_by_user(user_id)
-    unread_count = await notification_repo.get_unread_count(user_id)
+    notifications, unread_count = await notification_repo.list_with_unread_count(user_id)
     
     return {
         "notifications": notifications,
@@ -43,22 +34,27 @@ async def mark_notification_as_read(
     user_id: str = Depends(get_current_user_id)
 ):
     """Mark a notification as read."""
-    # Verify notification belongs to user
-    notifications = await notification_repo.get_notifications_by_user(user_id)
-    notification = next((n for n in notifications if n.get("id") == notification_id), None)
+    notification_oid = parse_object_id(notification_id)
     
-    if not notification:
+    # Verify notification belongs to user
+    if not await notification_repo.exists_for_user(notification_oid, user_id):
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    success = await notification_repo.mark_as_read(notification_id)
+    success = await notification_repo.mark_as_read(notification_oid)
     return {"success": success}
 
 
 @router.put("/read-all")
 async def mark_all_as_read(user_id: str = Depends(get_current_user_id)):
     """Mark all notifications as read."""
-    success = await notification_repo.mark_all_as_read(user_id)
-    return {"success": success, "message": "Đã đánh dấu tất cả thông báo là đã đọc"}
+    # One round-trip: the update reports how many were unread, and none are left after it
+    marked_count = await notification_repo.mark_all_as_read_and_return_prior_count(user_id)
+    return {
+        "success": marked_count > 0,
+        "message": "Đã đánh dấu tất cả thông báo là đã đọc",
+        "marked_count": marked_count,
+        "unread_count": 0
+    }
 
 
 @router.delete("/{notification_id}")
@@ -67,13 +63,12 @@ async def delete_notification(
     user_id: str = Depends(get_current_user_id)
 ):
     """Delete a notification."""
-    # Verify notification belongs to user
-    notifications = await notification_repo.get_notifications_by_user(user_id)
-    notification = next((n for n in notifications if n.get("id") == notification_id), None)
+    notification_oid = parse_object_id(notification_id)
     
-    if not notification:
+    # Verify notification belongs to user
+    if not await notification_repo.exists_for_user(notification_oid, user_id):
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    success = await notification_repo.delete_notification(notification_id)
+    success = await notification_repo.delete_notification(notification_oid)
     return {"success": success}
 
@@ -1,27 +1,39 @@
 """Routes for professor profile management."""
+import asyncio
 import os
-from fastapi import APIRouter, HTTPException, Depends, Request, File, UploadFile
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
+from typing import Dict, Optional, Tuple
 from pydantic import BaseModel
-from database.professor_profile_repository import ProfessorProfileRepository
-from database.user_repository import UserRepository
-from services.document_processor import DocumentProcessor
+from database.professor_profile_repository import get_profile_repo
+from database.cv_cache_repository import get_cv_cache_repo
+from dependencies.current_user import CurrentUser, get_current_user
+from services.document_processor import ALLOWED_EXTENSIONS, DocumentProcessor
 from services.cv_extractor import CVExtractor
 from services.s3_service import S3Service
 
 router = APIRouter(prefix="/api/professor-profile", tags=["professor-profile"])
-profile_repo = ProfessorProfileRepository()
-user_repo = UserRepository()
+profile_repo = get_profile_repo()
+cv_cache_repo = get_cv_cache_repo()
 
+# Initialize S3 service (optional, will fail gracefully if not configured)
+try:
+    s3_service = S3Service()
+except Exception as e:
+    print(f"Warning: S3 service not available: {e}")
+    s3_service = None
 
-async def get_current_user_id(request: Request) -> str:
-    """Get current user ID from request."""
-    user_id = request.headers.get("X-User-Id")
-    if not user_id:
-        user_id = request.query_params.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized. Please provide X-User-Id header.")
-    return user_id
+document_processor = DocumentProcessor()
+
+# Only this much CV text is stored (the AI extraction reads even less), so
+# parsing stops once it has been extracted
+CV_TEXT_MAX_CHARS = 10000
+
+# The CV extractor needs OPENAI_API_KEY; upload-cv reports the error if it is missing
+try:
+    cv_extractor = CVExtractor()
+except Exception as e:
+    print(f"Warning: CV extractor not available: {e}")
+    cv_extractor = None
 
 
 class ProfileCreateRequest(BaseModel):
@@ -38,17 +50,18 @@ class ProfileCreateRequest(BaseModel):
 
 
 @router.get("/")
-async def get_my_profile(user_id: str = Depends(get_current_user_id)):
+async def get_my_profile(current_user: CurrentUser = Depends(get_current_user)):
     """Get current user's professor profile."""
     # Check if user is professor
-    user = await user_repo.get_user_by_id(user_id)
+    user_id = current_user.user_id
+    user = current_user.user
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user.get("role") != "professor":
         raise HTTPException(status_code=403, detail="Only professors can access this endpoint")
     
-    profile = await profile_repo.get_profile_by_user_id(user_id)
+    profile = await current_user.get_profile()
     if not profile:
         return {"profile": None, "exists": False}
     
@@ -58,11 +71,12 @@ async def get_my_profile(user_id: str = Depends(get_current_user_id)):
 @router.post("/")
 async def create_profile(
     request: ProfileCreateRequest,
-    user_id: str = Depends(get_current_user_id)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create or update professor profile."""
     # Check if user is professor
-    user = await user_repo.get_user_by_id(user_id)
+    user_id = current_user.user_id
+    user = current_user.user
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -83,12 +97,11 @@ async def create_profile(
     }
     
     # Check if profile exists
-    existing = await profile_repo.get_profile_by_user_id(user_id)
+    existing = await current_user.get_profile()
     if existing:
         # Update existing profile
-        success = await profile_repo.update_profile(user_id, profile_data)
-        if success:
-            updated_profile = await profile_repo.get_profile_by_user_id(user_id)
+        updated_profile = await profile_repo.update_profile(user_id, profile_data)
+        if updated_profile:
             return {
                 "success": True,
                 "message": "Profile updated successfully",
@@ -110,11 +123,12 @@ async def create_profile(
 @router.put("/")
 async def update_profile(
     request: ProfileCreateRequest,
-    user_id: str = Depends(get_current_user_id)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Update professor profile."""
     # Check if user is professor
-    user = await user_repo.get_user_by_id(user_id)
+    user_id = current_user.user_id
+    user = current_user.user
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -133,9 +147,8 @@ async def update_profile(
         "contact_email": request.contact_email or user.get("email"),
     }
     
-    success = await profile_repo.update_profile(user_id, profile_data)
-    if success:
-        updated_profile = await profile_repo.get_profile_by_user_id(user_id)
+    updated_profile = await profile_repo.update_profile(user_id, profile_data)
+    if updated_profile:
         return {
             "success": True,
             "message": "Profile updated successfully",
@@ -146,10 +159,11 @@ async def update_profile(
 
 
 @router.delete("/")
-async def delete_profile(user_id: str = Depends(get_current_user_id)):
+async def delete_profile(current_user: CurrentUser = Depends(get_current_user)):
     """Delete professor profile."""
     # Check if user is professor
-    user = await user_repo.get_user_by_id(user_id)
+    user_id = current_user.user_id
+    user = current_user.user
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -163,14 +177,56 @@ async def delete_profile(user_id: str = Depends(get_current_user_id)):
         raise HTTPException(status_code=404, detail="Profile not found")
 
 
+async def _upload_cv_to_s3(file: UploadFile, user_id: str, file_ext: str) -> Tuple[Optional[str], Optional[str]]:
+    """Upload a CV to S3, returning (s3_url, s3_key) or (None, None) on failure."""
+    try:
+        if s3_service is None:
+            raise ValueError("S3 service is not configured")
+        file.file.seek(0)
+        # boto3 blocks; keep the event loop free while the upload runs
+        return await asyncio.to_thread(
+            s3_service.upload_file,
+            file_content=file.file,
+            filename=file.filename,
+            user_id=user_id,
+            file_type=file_ext[1:] if file_ext.startswith('.') else file_ext
+        )
+    except Exception as e:
+        print(f"Warning: S3 upload failed (continuing without S3): {e}")
+        return None, None
+
+
+async def _extract_cv(text: str) -> Dict:
+    """Extract profile fields from CV text, reusing a cached result for the same text."""
+    # Keyed by model + the prompt's slice of the text, so re-uploads of the same
+    # CV (or one differing only past the truncation point) reuse the result
+    digest = cv_extractor.cache_key(text)
+    try:
+        cached = await cv_cache_repo.get_extracted_data(digest)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        print(f"Warning: CV extraction cache lookup failed: {e}")
+    
+    extracted_data = await cv_extractor.extract_from_cv(text)
+    # An empty result means the extraction failed; don't cache it
+    if extracted_data:
+        try:
+            await cv_cache_repo.set_extracted_data(digest, extracted_data)
+        except Exception as e:
+            print(f"Warning: Could not cache CV extraction: {e}")
+    return extracted_data
+
+
 @router.post("/upload-cv")
 async def upload_cv(
     file: UploadFile = File(...),
-    user_id: str = Depends(get_current_user_id)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Upload CV and extract profile information using AI."""
     # Check if user is professor
-    user = await user_repo.get_user_by_id(user_id)
+    user_id = current_user.user_id
+    user = current_user.user
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -179,19 +235,15 @@ async def upload_cv(
     
     # Validate file type
     file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in ['.pdf', '.docx', '.doc', '.txt']:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail="File type not supported. Please upload PDF, DOCX, DOC, or TXT file."
         )
     
     try:
-        # Read file content
-        contents = await file.read()
-        
-        # Process document to extract text
-        document_processor = DocumentProcessor()
-        text = await document_processor.process_file(contents, file_ext)
+        # Process the spooled upload in place instead of reading it into memory
+        text = await document_processor.process_file(file.file, file_ext, max_chars=CV_TEXT_MAX_CHARS)
         
         if not text or len(text.strip()) < 50:
             raise HTTPException(
@@ -199,26 +251,18 @@ async def upload_cv(
                 detail="Could not extract text from CV. Please ensure the file is readable."
             )
         
-        # Extract profile information using AI
-        cv_extractor = CVExtractor()
-        extracted_data = await cv_extractor.extract_from_cv(text)
+        if cv_extractor is None:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        # Upload CV to S3
-        s3_url = None
-        s3_key = None
-        try:
-            s3_service = S3Service()
-            s3_url, s3_key = s3_service.upload_file(
-                file_content=contents,
-                filename=file.filename,
-                user_id=user_id,
-                file_type=file_ext[1:] if file_ext.startswith('.') else file_ext
-            )
-        except Exception as e:
-            print(f"Warning: S3 upload failed (continuing without S3): {e}")
-        
-        # Get or create profile
-        profile = await profile_repo.get_profile_by_user_id(user_id)
+        # Extract profile information using AI while the CV is uploaded to S3 and
+        # the existing profile is looked up. The upload is listed first so its
+        # worker thread is already running when the extraction starts waiting
+        # on the LLM. S3 failures are already turned into (None, None).
+        (s3_url, s3_key), extracted_data, profile = await asyncio.gather(
+            _upload_cv_to_s3(file, user_id, file_ext),
+            _extract_cv(text),
+            current_user.get_profile()
+        )
         
         # Prepare profile data from extracted information
         profile_data = {
@@ -233,13 +277,12 @@ async def upload_cv(
             "publications": extracted_data.get("publications") or "",
             "contact_email": extracted_data.get("email") or user.get("email"),
             "cv_url": s3_url or "",
-            "cv_text": text[:10000],  # Store first 10000 chars
+            "cv_text": text[:CV_TEXT_MAX_CHARS],  # Store first 10000 chars
         }
         
         if profile:
             # Update existing profile
-            await profile_repo.update_profile(user_id, profile_data)
-            updated_profile = await profile_repo.get_profile_by_user_id(user_id)
+            updated_profile = await profile_repo.update_profile(user_id, profile_data)
             return {
                 "success": True,
                 "message": "CV uploaded and profile updated successfully",
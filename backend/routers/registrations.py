@@ -1,21 +1,30 @@
 """Registration routes for student professor preferences."""
-from fastapi import APIRouter, HTTPException, Depends, Request
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime
-from database.registration_repository import RegistrationRepository
-from database.user_repository import UserRepository
-from database.document_repository import DocumentRepository
-from database.notification_repository import NotificationRepository
+from pymongo.errors import DuplicateKeyError
+from database.registration_repository import get_registration_repo
+from database.user_repository import get_user_repo
+from database.document_repository import get_document_repo
+from database.notification_repository import get_notification_repo
+from database.professor_profile_repository import get_profile_repo
+from database.professors import ProfessorDatabase
 from services.s3_service import S3Service
+from dependencies.current_user import CurrentUser, get_current_user, get_current_user_id
+from dependencies.ids import parse_object_id
 
 router = APIRouter(prefix="/api/registrations", tags=["registrations"])
-registration_repo = RegistrationRepository()
-user_repo = UserRepository()
-doc_repo = DocumentRepository()
-notification_repo = NotificationRepository()
+registration_repo = get_registration_repo()
+user_repo = get_user_repo()
+doc_repo = get_document_repo()
+notification_repo = get_notification_repo()
+profile_repo = get_profile_repo()
+professor_db = ProfessorDatabase()
 s3_service = S3Service() if S3Service else None
 
+DUPLICATE_REGISTRATION_MESSAGE = "Bạn đã đăng ký một giảng viên cho tài liệu này. Mỗi học sinh chỉ được đăng ký 1 giảng viên."
+
 
 class CreateRegistrationRequest(BaseModel):
     """Request model for creating registration."""
@@ -25,46 +34,60 @@ class CreateRegistrationRequest(BaseModel):
     notes: Optional[str] = None
 
 
-async def get_current_user_id(request: Request) -> str:
-    """Get current user ID from request."""
-    user_id = request.headers.get("X-User-Id")
-    if not user_id:
-        user_id = request.query_params.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized. Please provide X-User-Id header.")
-    return user_id
+async def _notify_professor_of_registration(
+    registration_id: str,
+    student_id: str,
+    student_name: str,
+    professor_id: str,
+    document_id: str
+):
+    """Create the professor's notification for a new registration."""
+    try:
+        professor_profile, document = await asyncio.gather(
+            profile_repo.get_profile_by_id(professor_id),
+            doc_repo.get_document_by_id(document_id, fields=["filename"])
+        )
+        if professor_profile:
+            professor_user_id = professor_profile.get("user_id")
+            document_name = document.get("filename", "tài liệu") if document else "tài liệu"
+            
+            await notification_repo.create_notification({
+                "user_id": professor_user_id,
+                "type": "registration_request",
+                "title": "Có học sinh đăng ký hướng dẫn",
+                "message": f"{student_name} đã đăng ký hướng dẫn với tài liệu '{document_name}'",
+                "related_user_id": student_id,
+                "related_registration_id": str(registration_id),
+                "related_document_id": document_id
+            })
+    except Exception as e:
+        print(f"Warning: Could not create notification for professor: {e}")
 
 
 @router.post("/")
 async def create_registration(
     request: CreateRegistrationRequest,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id)
 ):
     """Create a new registration (student registers for professor)."""
+    # Students can only register for ONE professor per document. The unique
+    # (student_id, document_id) index rejects duplicates on insert; without it,
+    # look for an existing registration first, alongside the user lookup.
+    lookups = [user_repo.get_user_by_id(user_id)]
+    if not registration_repo.unique_document_per_student:
+        lookups.append(registration_repo.has_student_registration(user_id, request.document_id))
+    user, *already_registered = await asyncio.gather(*lookups)
+    
     # Check if user is a student
-    user = await user_repo.get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user.get("role") != "student":
         raise HTTPException(status_code=403, detail="Only students can register for professors")
     
-    # Check if student already has a registration for this document
-    # Students can only register for ONE professor per document
-    existing_regs = await registration_repo.get_registrations_by_student(user_id)
-    for reg in existing_regs:
-        # Check if already registered for this document (regardless of professor)
-        if reg.get("document_id") == request.document_id:
-            raise HTTPException(
-                status_code=400,
-                detail="Bạn đã đăng ký một giảng viên cho tài liệu này. Mỗi học sinh chỉ được đăng ký 1 giảng viên."
-            )
-        # Also check if already registered for this specific professor
-        if reg.get("professor_id") == request.professor_id and reg.get("document_id") == request.document_id:
-            raise HTTPException(
-                status_code=400,
-                detail="Bạn đã đăng ký giảng viên này rồi."
-            )
+    if any(already_registered):
+        raise HTTPException(status_code=400, detail=DUPLICATE_REGISTRATION_MESSAGE)
     
     # Create registration
     registration_data = {
@@ -76,33 +99,23 @@ async def create_registration(
         "notes": request.notes
     }
     
-    registration_id = await registration_repo.create_registration(registration_data)
+    try:
+        registration_id = await registration_repo.create_registration(registration_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail=DUPLICATE_REGISTRATION_MESSAGE)
     
     # Add to user's registrations
     await user_repo.add_registration_to_student(user_id, registration_id)
     
-    # Create notification for professor
-    try:
-        from database.professor_profile_repository import ProfessorProfileRepository
-        profile_repo = ProfessorProfileRepository()
-        professor_profile = await profile_repo.get_profile_by_id(request.professor_id)
-        if professor_profile:
-            professor_user_id = professor_profile.get("user_id")
-            student_name = user.get("name", "Một học sinh")
-            document = await doc_repo.get_document_by_id(request.document_id)
-            document_name = document.get("filename", "tài liệu") if document else "tài liệu"
-            
-            await notification_repo.create_notification({
-                "user_id": professor_user_id,
-                "type": "registration_request",
-                "title": "Có học sinh đăng ký hướng dẫn",
-                "message": f"{student_name} đã đăng ký hướng dẫn với tài liệu '{document_name}'",
-                "related_user_id": user_id,
-                "related_registration_id": str(registration_id),
-                "related_document_id": request.document_id
-            })
-    except Exception as e:
-        print(f"Warning: Could not create notification for professor: {e}")
+    # The notification isn't part of the response; create it after responding
+    background_tasks.add_task(
+        _notify_professor_of_registration,
+        registration_id,
+        user_id,
+        user.get("name", "Một học sinh"),
+        request.professor_id,
+        request.document_id
+    )
     
     # Convert all values to JSON-serializable format
     response_data = {
@@ -120,53 +133,61 @@ async def create_registration(
 
 
 @router.get("/")
-async def get_my_registrations(user_id: str = Depends(get_current_user_id)):
+async def get_my_registrations(current_user: CurrentUser = Depends(get_current_user)):
     """Get all registrations for current user."""
-    user = await user_repo.get_user_by_id(user_id)
-    if not user:
+    user_id = current_user.user_id
+    if not current_user.user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    if user.get("role") == "student":
+    if current_user.role == "student":
         registrations = await registration_repo.get_registrations_by_student(user_id)
-    elif user.get("role") == "professor":
-        # For professors, we need to find their profile first, then get registrations
-        # because professor_id in registration is profile ID, not user_id
-        try:
-            from database.professor_profile_repository import ProfessorProfileRepository
-            profile_repo = ProfessorProfileRepository()
-            profile = await profile_repo.get_profile_by_user_id(user_id)
-            
-            if profile:
-                # Get registrations by profile ID
-                profile_id = profile.get("id")
-                registrations = await registration_repo.get_registrations_by_professor(profile_id)
-            else:
-                # No profile found, return empty list
-                registrations = []
-        except Exception as e:
-            print(f"Error getting professor profile: {e}")
-            # Fallback: try to get by user_id directly (for backward compatibility)
-            registrations = await registration_repo.get_registrations_by_professor(user_id)
+    elif current_user.role == "professor":
+        # professor_id in registration is profile ID, not user_id
+        profile_id = await current_user.get_professor_profile_id()
+        # No profile found, return empty list
+        registrations = await registration_repo.get_registrations_by_professor(profile_id) if profile_id else []
     else:
         raise HTTPException(status_code=403, detail="Invalid user role")
     
-    # Enrich registrations with professor and document info
-    from database.professors import ProfessorDatabase
-    professor_db = ProfessorDatabase()
+    # Enrich registrations with professor and document info.
+    # Load every profile and document the registrations refer to with one query
+    # per collection instead of several queries per registration
+    profiles_by_id, documents_by_id = await asyncio.gather(
+        profile_repo.get_profiles_by_ids(
+            (reg.get("professor_id") for reg in registrations),
+            fields=["user_id", "contact_email"]
+        ),
+        doc_repo.get_documents_by_ids(
+            (reg.get("document_id") for reg in registrations),
+            fields=["filename", "created_at"]
+        ),
+        return_exceptions=True
+    )
+    if isinstance(profiles_by_id, Exception):
+        print(f"Warning: Could not get professor email: {profiles_by_id}")
+        profiles_by_id = {}
+    if isinstance(documents_by_id, Exception):
+        print(f"Warning: Could not get document info: {documents_by_id}")
+        documents_by_id = {}
+    
+    # Profiles without a contact_email fall back to the professor's account email
+    professor_user_ids = {
+        profile.get("user_id")
+        for profile in profiles_by_id.values()
+        if not profile.get("contact_email") and profile.get("user_id")
+    }
+    professor_users_by_id = {}
+    if professor_user_ids:
+        try:
+            professor_users_by_id = await user_repo.get_users_by_ids(professor_user_ids, fields=["email"])
+        except Exception as e:
+            print(f"Warning: Could not get professor email: {e}")
     
     enriched_registrations = []
     for reg in registrations:
-        # Convert all ObjectId fields to string for JSON serialization
-        enriched_reg = {}
-        for key, value in reg.items():
-            # Check if value is ObjectId
-            if hasattr(value, '__class__') and value.__class__.__name__ == 'ObjectId':
-                enriched_reg[key] = str(value)
-            elif isinstance(value, datetime):
-                # Convert datetime to ISO format string
-                enriched_reg[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-            else:
-                enriched_reg[key] = value
+        # Rows come from the aggregation with a string id and no ObjectIds; the
+        # datetimes are encoded by the response serializer
+        enriched_reg = reg
         
         # Get professor info
         try:
@@ -178,39 +199,23 @@ async def get_my_registrations(user_id: str = Depends(get_current_user_id)):
         except Exception as e:
             print(f"Warning: Could not get professor info: {e}")
         
-        # Get professor email from profile or user
-        try:
-            from database.professor_profile_repository import ProfessorProfileRepository
-            profile_repo = ProfessorProfileRepository()
-            profile = await profile_repo.get_profile_by_id(reg.get("professor_id"))
+        # Get professor email from profile (contact_email) or user
+        profile = profiles_by_id.get(reg.get("professor_id"))
+        if profile:
+            professor_email = profile.get("contact_email")
+            if not professor_email:
+                professor_user = professor_users_by_id.get(profile.get("user_id"))
+                if professor_user:
+                    professor_email = professor_user.get("email")
             
-            if profile:
-                # Try to get email from profile first (contact_email)
-                professor_email = profile.get("contact_email")
-                
-                # If no contact_email, get from user
-                if not professor_email:
-                    professor_user_id = profile.get("user_id")
-                    if professor_user_id:
-                        professor_user = await user_repo.get_user_by_id(professor_user_id)
-                        if professor_user:
-                            professor_email = professor_user.get("email")
-                
-                if professor_email:
-                    enriched_reg["professor_email"] = professor_email
-        except Exception as e:
-            print(f"Warning: Could not get professor email: {e}")
+            if professor_email:
+                enriched_reg["professor_email"] = professor_email
         
         # Get document info (if available)
-        try:
-            from database.document_repository import DocumentRepository
-            doc_repo = DocumentRepository()
-            document = await doc_repo.get_document_by_id(reg.get("document_id"))
-            if document:
-                enriched_reg["document_filename"] = document.get("filename")
-                enriched_reg["document_created_at"] = document.get("created_at")
-        except Exception as e:
-            print(f"Warning: Could not get document info: {e}")
+        document = documents_by_id.get(reg.get("document_id"))
+        if document:
+            enriched_reg["document_filename"] = document.get("filename")
+            enriched_reg["document_created_at"] = document.get("created_at")
         
         enriched_registrations.append(enriched_reg)
     
@@ -220,49 +225,33 @@ async def get_my_registrations(user_id: str = Depends(get_current_user_id)):
 @router.get("/{registration_id}")
 async def get_registration(
     registration_id: str,
-    user_id: str = Depends(get_current_user_id)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get a specific registration."""
-    registration = await registration_repo.get_registration_by_id(registration_id)
+    registration_oid = parse_object_id(registration_id)
+    user_id = current_user.user_id
+    if current_user.role == "professor":
+        # For professors, access is checked by profile ID; look it up alongside
+        registration, profile_id = await asyncio.gather(
+            registration_repo.get_registration_by_id(registration_oid),
+            current_user.get_professor_profile_id()
+        )
+    else:
+        registration = await registration_repo.get_registration_by_id(registration_oid)
     if not registration:
         raise HTTPException(status_code=404, detail="Registration not found")
     
     # Check access (student or professor)
-    user = await user_repo.get_user_by_id(user_id)
-    if user.get("role") == "student" and registration.get("student_id") != user_id:
+    if not current_user.user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if current_user.role == "student" and registration.get("student_id") != user_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    # Fallback: professors without a profile are checked by user_id directly
+    if current_user.role == "professor" and registration.get("professor_id") != (profile_id or user_id):
         raise HTTPException(status_code=403, detail="Access denied")
-    if user.get("role") == "professor":
-        # For professors, check by profile ID
-        try:
-            from database.professor_profile_repository import ProfessorProfileRepository
-            profile_repo = ProfessorProfileRepository()
-            profile = await profile_repo.get_profile_by_user_id(user_id)
-            if profile:
-                profile_id = profile.get("id")
-                if registration.get("professor_id") != profile_id:
-                    raise HTTPException(status_code=403, detail="Access denied")
-            else:
-                # Fallback: check by user_id directly
-                if registration.get("professor_id") != user_id:
-                    raise HTTPException(status_code=403, detail="Access denied")
-        except HTTPException:
-            raise
-        except Exception:
-            # Fallback: check by user_id directly
-            if registration.get("professor_id") != user_id:
-                raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Convert ObjectId to string for JSON serialization
-    result = {}
-    for key, value in registration.items():
-        if hasattr(value, '__class__') and value.__class__.__name__ == 'ObjectId':
-            result[key] = str(value)
-        elif isinstance(value, datetime):
-            result[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-        else:
-            result[key] = value
     
-    return result
+    # get_registration_by_id already turns _id into a string id
+    return registration
 
 
 class UpdateStatusRequest(BaseModel):
@@ -276,51 +265,35 @@ class UpdateStatusRequest(BaseModel):
 async def update_registration_status(
     registration_id: str,
     request: UpdateStatusRequest,
-    user_id: str = Depends(get_current_user_id)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Update registration status (only professor can accept/reject)."""
-    registration = await registration_repo.get_registration_by_id(registration_id)
+    registration_oid = parse_object_id(registration_id)
+    # Check if user is a professor before querying anything else
+    if current_user.role != "professor":
+        raise HTTPException(status_code=403, detail="Only the professor can update status")
+    
+    # Get professor's profile ID (professor_id in registration is profile ID, not user_id)
+    # while the registration loads
+    registration, profile_id = await asyncio.gather(
+        registration_repo.get_registration_by_id(registration_oid),
+        current_user.get_professor_profile_id()
+    )
     if not registration:
         raise HTTPException(status_code=404, detail="Registration not found")
     
-    # Check if user is the professor
-    user = await user_repo.get_user_by_id(user_id)
-    if user.get("role") != "professor":
+    # Fallback: professors without a profile are checked by user_id directly
+    profile_id = profile_id or current_user.user_id
+    if registration.get("professor_id") != profile_id:
         raise HTTPException(status_code=403, detail="Only the professor can update status")
     
-    # Get professor's profile ID (professor_id in registration is profile ID, not user_id)
-    profile_id = None
-    try:
-        from database.professor_profile_repository import ProfessorProfileRepository
-        profile_repo = ProfessorProfileRepository()
-        profile = await profile_repo.get_profile_by_user_id(user_id)
-        
-        if profile:
-            profile_id = profile.get("id")
-            if registration.get("professor_id") != profile_id:
-                raise HTTPException(status_code=403, detail="Only the professor can update status")
-        else:
-            # Fallback: check by user_id directly (for backward compatibility)
-            if registration.get("professor_id") != user_id:
-                raise HTTPException(status_code=403, detail="Only the professor can update status")
-            profile_id = user_id
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error checking professor profile: {e}")
-        # Fallback: check by user_id directly
-        if registration.get("professor_id") != user_id:
-            raise HTTPException(status_code=403, detail="Only the professor can update status")
-        profile_id = user_id
-    
     if request.status not in ["pending", "accepted", "rejected"]:
         raise HTTPException(status_code=400, detail="Invalid status")
     
     # Check limit: professor can only accept maximum 2 students
     if request.status == "accepted" and profile_id:
-        # Count current accepted registrations for this professor
-        all_regs = await registration_repo.get_registrations_by_professor(profile_id)
-        accepted_count = sum(1 for reg in all_regs if reg.get("status") == "accepted")
+        # Count current accepted registrations for this professor (index-only count)
+        accepted_count = await registration_repo.count_accepted_for_professor(profile_id)
         
         # If this registration is already accepted, don't count it again
         if registration.get("status") != "accepted":
@@ -341,7 +314,7 @@ async def update_registration_status(
             combined_notes = f"Lý do: {request.reason}"
     
     success = await registration_repo.update_registration_status(
-        registration_id,
+        registration_oid,
         request.status,
         combined_notes
     )
@@ -359,7 +332,8 @@ async def delete_registration(
     user_id: str = Depends(get_current_user_id)
 ):
     """Delete a registration (only student can delete their own)."""
-    registration = await registration_repo.get_registration_by_id(registration_id)
+    registration_oid = parse_object_id(registration_id)
+    registration = await registration_repo.get_registration_by_id(registration_oid)
     if not registration:
         raise HTTPException(status_code=404, detail="Registration not found")
     
@@ -367,6 +341,6 @@ async def delete_registration(
     if registration.get("student_id") != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    success = await registration_repo.delete_registration(registration_id)
+    success = await registration_repo.delete_registration(registration_oid)
     return {"success": success}
 
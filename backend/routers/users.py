@@ -1,21 +1,12 @@
 """User routes."""
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional
-from database.user_repository import UserRepository
+from database.user_repository import get_user_repo
+from dependencies.current_user import get_current_user_id
 from models.user import User
 
 router = APIRouter(prefix="/api/users", tags=["users"])
-user_repo = UserRepository()
-
-
-async def get_current_user_id(request: Request) -> str:
-    """Get current user ID from request."""
-    user_id = request.headers.get("X-User-Id")
-    if not user_id:
-        user_id = request.query_params.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized. Please provide X-User-Id header.")
-    return user_id
+user_repo = get_user_repo()
 
 
 @router.get("/me")
@@ -48,55 +39,35 @@ async def create_user(user_data: dict):
             requested_role = user_data.get("role")
             
             # If roles don't match and user already has a role, reject role change
-            if existing_role and requested_role and existing_role != requested_role:
+            role_mismatch = bool(existing_role and requested_role and existing_role != requested_role)
+            if role_mismatch:
                 print(f"⚠️ Role mismatch: User {user_data.get('google_id')} tried to login as '{requested_role}' but database has '{existing_role}'. Keeping original role.")
-                # Update other info but keep original role
-                update_data = {}
-                if user_data.get("email") and existing_user.get("email") != user_data.get("email"):
-                    update_data["email"] = user_data.get("email")
-                if user_data.get("name") and existing_user.get("name") != user_data.get("name"):
-                    update_data["name"] = user_data.get("name")
-                if user_data.get("avatar_url") and existing_user.get("avatar_url") != user_data.get("avatar_url"):
-                    update_data["avatar_url"] = user_data.get("avatar_url")
-                
-                if update_data:
-                    from datetime import datetime
-                    update_data["updated_at"] = datetime.utcnow()
-                    await user_repo.update_user(existing_user["id"], update_data)
-                    updated_user = await user_repo.get_user_by_id(existing_user["id"])
-                    return {"id": updated_user.get("id"), **updated_user, "role_mismatch": True, "original_role": existing_role}
-                
-                # Return existing user with role mismatch flag
-                return {"id": existing_user.get("id"), **existing_user, "role_mismatch": True, "original_role": existing_role}
             
             # Update user info if needed (but keep original role)
-            update_data = {}
-            if user_data.get("email") and existing_user.get("email") != user_data.get("email"):
-                update_data["email"] = user_data.get("email")
-            if user_data.get("name") and existing_user.get("name") != user_data.get("name"):
-                update_data["name"] = user_data.get("name")
-            if user_data.get("avatar_url") and existing_user.get("avatar_url") != user_data.get("avatar_url"):
-                update_data["avatar_url"] = user_data.get("avatar_url")
+            update_data = {
+                field: user_data[field]
+                for field in ("email", "name", "avatar_url")
+                if user_data.get(field) and existing_user.get(field) != user_data[field]
+            }
             
             # Only update role if user doesn't have one yet (first time setup)
             if not existing_role and requested_role:
                 update_data["role"] = requested_role
             
+            user = existing_user
             if update_data:
-                from datetime import datetime
-                update_data["updated_at"] = datetime.utcnow()
-                await user_repo.update_user(existing_user["id"], update_data)
-                updated_user = await user_repo.get_user_by_id(existing_user["id"])
-                return {"id": updated_user.get("id"), **updated_user}
+                # The update returns the new document, so no re-read is needed
+                user = await user_repo.update_user_and_get(existing_user["id"], update_data) or existing_user
             
-            # Return existing user with id
-            return {"id": existing_user.get("id"), **existing_user}
+            if role_mismatch:
+                return {"id": user.get("id"), **user, "role_mismatch": True, "original_role": existing_role}
+            return {"id": user.get("id"), **user}
         
-        # Create new user (first time)
+        # Create new user (first time). insert_one fills in _id, and create_user
+        # adds the timestamps, so user_data already is the stored document.
         user_id = await user_repo.create_user(user_data)
-        # Get the created user to return full data
-        created_user = await user_repo.get_user_by_id(user_id)
-        return {"id": user_id, **created_user} if created_user else {"id": user_id, **user_data}
+        user_data.pop("_id", None)
+        return {"id": user_id, **user_data}
     except Exception as e:
         # If MongoDB connection fails, still return user data but log error
         import traceback
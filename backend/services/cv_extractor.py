@@ -1,23 +1,47 @@
 """CV extraction service using AI."""
+import hashlib
+import json
 import os
-from openai import OpenAI
 from services.document_processor import DocumentProcessor
+from services.openai_client import get_openai_client
 from typing import Dict, Optional
 
 
 class CVExtractor:
     """Service for extracting structured information from CV using AI."""
     
+    # Only this much CV text is sent to the model
+    MAX_CV_CHARS = 8000
+    # Existing profile fields that are included in the prompt
+    PROMPT_PROFILE_FIELDS = ("name", "title", "department", "research_interests", "expertise_areas")
+    
     def __init__(self):
         """Initialize CV extractor."""
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = OpenAI(api_key=api_key)
+        # Async client: the request awaits the completion instead of blocking the event loop
+        self.client = get_openai_client()
         self.model = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
         self.doc_processor = DocumentProcessor()
     
+    def cache_key(self, cv_text: str, existing_profile: Optional[Dict] = None) -> str:
+        """
+        Digest of everything that determines an extraction result.
+        
+        Covers the model, the part of the CV the prompt actually includes and
+        the existing profile fields merged into the prompt.
+        """
+        parts = [self.model, cv_text[:self.MAX_CV_CHARS]]
+        if existing_profile:
+            parts.append(json.dumps(
+                {field: existing_profile.get(field) for field in self.PROMPT_PROFILE_FIELDS},
+                sort_keys=True,
+                ensure_ascii=False
+            ))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    
     async def extract_from_cv(
         self,
         cv_text: str,
@@ -38,8 +62,8 @@ class CVExtractor:
         
         try:
             # Truncate if too long
-            if len(cv_text) > 8000:
-                cv_text = cv_text[:8000] + "..."
+            if len(cv_text) > self.MAX_CV_CHARS:
+                cv_text = cv_text[:self.MAX_CV_CHARS] + "..."
             
             existing_info = ""
             if existing_profile:
@@ -83,7 +107,7 @@ Hãy trả về kết quả dưới dạng JSON với các key sau:
 
 Chỉ trả về JSON, không thêm text khác."""
 
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {
@@ -99,7 +123,6 @@ Chỉ trả về JSON, không thêm text khác."""
                 response_format={"type": "json_object"}
             )
             
-            import json
             result_text = response.choices[0].message.content.strip()
             
             # Try to parse JSON
@@ -1,59 +1,126 @@
 """Document processing service for extracting text from various file formats."""
+import asyncio
 import io
 import os
-from typing import Optional
-import PyPDF2
-from docx import Document
+import threading
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+# pypdfium2 (or PyPDF2) and python-docx are imported inside the extract methods: they
+# are only needed when a file is actually uploaded, so keep them off the cold-start path.
+
+
+# PDFium is not thread-safe, even across different documents, and PDF
+# extraction runs in worker threads: only one thread may use it at a time
+_PDFIUM_LOCK = threading.Lock()
+
+# Upload types process_file understands; checked once per upload request
+ALLOWED_EXTENSIONS = frozenset({'.pdf', '.docx', '.doc', '.txt'})
+UNSUPPORTED_FILE_TYPE_MESSAGE = "File type not supported. Allowed: .pdf, .docx, .doc, .txt"
+
+
+def get_file_size(file: BinaryIO) -> int:
+    """Size of a seekable file in bytes; leaves the position at the start."""
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    return size
+
+
+def _join_until(parts: Iterable[str], max_chars: Optional[int]) -> str:
+    """Join text parts with newlines, consuming no more parts once max_chars is reached."""
+    collected = []
+    total = 0
+    for part in parts:
+        collected.append(part)
+        total += len(part)
+        if max_chars is not None and total >= max_chars:
+            break
+    return "\n".join(collected).strip()
+
+
+
+def _pdfium_page_texts(pdf) -> Iterator[str]:
+    """Yield the text of each page of a pypdfium2 document, one page at a time."""
+    for index in range(len(pdf)):
+        page = pdf[index]
+        textpage = page.get_textpage()
+        text = textpage.get_text_range()
+        textpage.close()
+        page.close()
+        # PDFium separates lines with CRLF; match PyPDF2's plain newlines
+        yield text.replace("\r\n", "\n")
 
 
 class DocumentProcessor:
     """Process documents and extract text."""
     
-    async def process_file(self, file_contents: bytes, file_ext: str) -> str:
+    async def process_file(
+        self,
+        file_contents: Union[bytes, BinaryIO],
+        file_ext: str,
+        max_chars: Optional[int] = None
+    ) -> str:
         """
         Process file and extract text.
         
         Args:
-            file_contents: File content as bytes
+            file_contents: File content as bytes, or a seekable binary file
+                (e.g. UploadFile.file) which is parsed in place without
+                being read into memory first
             file_ext: File extension (e.g., '.pdf', '.docx')
+            max_chars: Stop parsing PDF pages / DOCX paragraphs once this much
+                text has been extracted (callers still truncate the result)
         
         Returns:
             Extracted text
         """
+        if isinstance(file_contents, (bytes, bytearray)):
+            file_contents = io.BytesIO(file_contents)
+        
+        # PDF/DOCX parsing is CPU-bound pure Python; run it in a worker thread
+        # so the event loop keeps serving other requests meanwhile
         if file_ext == '.pdf':
-            return self._extract_from_pdf(file_contents)
+            return await asyncio.to_thread(self._extract_from_pdf, file_contents, max_chars)
         elif file_ext in ['.docx', '.doc']:
-            return self._extract_from_docx(file_contents)
+            return await asyncio.to_thread(self._extract_from_docx, file_contents, max_chars)
         elif file_ext == '.txt':
-            return file_contents.decode('utf-8')
+            return file_contents.read().decode('utf-8')
         else:
             raise ValueError(f"Unsupported file type: {file_ext}")
     
-    def _extract_from_pdf(self, file_contents: bytes) -> str:
+    def _extract_from_pdf(self, pdf_file: BinaryIO, max_chars: Optional[int] = None) -> str:
         """Extract text from PDF file."""
         try:
-            pdf_file = io.BytesIO(file_contents)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            try:
+                # PDFium is native code and much faster than PyPDF2 on multi-page files
+                import pypdfium2 as pdfium
+            except ImportError:
+                pdfium = None
             
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            if pdfium is not None:
+                with _PDFIUM_LOCK:
+                    pdf = pdfium.PdfDocument(pdf_file)
+                    try:
+                        return _join_until(_pdfium_page_texts(pdf), max_chars)
+                    finally:
+                        pdf.close()
             
-            return text.strip()
+            import PyPDF2
+            
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            return _join_until(
+                (page.extract_text() or "" for page in pdf_reader.pages),
+                max_chars
+            )
         except Exception as e:
             raise ValueError(f"Error extracting PDF text: {str(e)}")
     
-    def _extract_from_docx(self, file_contents: bytes) -> str:
+    def _extract_from_docx(self, doc_file: BinaryIO, max_chars: Optional[int] = None) -> str:
         """Extract text from DOCX file."""
         try:
-            doc_file = io.BytesIO(file_contents)
-            doc = Document(doc_file)
-            
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            from docx import Document
             
-            return text.strip()
+            doc = Document(doc_file)
+            return _join_until((paragraph.text for paragraph in doc.paragraphs), max_chars)
         except Exception as e:
             raise ValueError(f"Error extracting DOCX text: {str(e)}")
-
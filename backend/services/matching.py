@@ -1,8 +1,11 @@
 """AI matching service for finding suitable professors using OpenAI embeddings."""
+import asyncio
+import hashlib
+import logging
 import os
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Optional
 import numpy as np
-from openai import OpenAI
 
 try:
     from dotenv import load_dotenv
@@ -11,6 +14,71 @@ except ImportError:
     pass  # dotenv is optional
 
 from database.professors import ProfessorDatabase
+from database.redis_cache import cache_get, cache_set
+from services.openai_client import get_openai_client, get_sync_openai_client
+
+logger = logging.getLogger(__name__)
+
+# Query embeddings kept in memory per process (~6 KB each at 1536 dims)
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# Embeddings of a text never change for a given model; keep them a day in Redis
+QUERY_EMBEDDING_TTL_SECONDS = 24 * 60 * 60
+# Chat completions in flight at once per process, to stay within the OpenAI rate limits
+ANALYSIS_CONCURRENCY = 5
+# How often long-running servers pick up new or changed professor profiles
+PROFESSOR_REFRESH_SECONDS = int(os.getenv("PROFESSOR_REFRESH_SECONDS", "600"))
+# Report excerpt sent with each analysis prompt: capped in tokens when tiktoken
+# is installed, otherwise in characters
+REPORT_PREVIEW_MAX_TOKENS = 1500
+REPORT_PREVIEW_MAX_CHARS = 2000
+
+ANALYSIS_SYSTEM_PROMPT = (
+    "Bạn là một trợ lý AI chuyên phân tích và đánh giá sự phù hợp giữa bài báo cáo và profile giảng viên. "
+    "Hãy đưa ra phân tích ngắn gọn, rõ ràng bằng tiếng Việt."
+)
+
+
+def _text_digest(model: str, text: str) -> str:
+    """Cache key for the embedding of a text under a given model."""
+    return hashlib.blake2b(f"{model}|{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _professor_prompt_info(professor: Dict) -> str:
+    """Professor details for the analysis prompt (MongoDB profile or JSON file format)."""
+    if isinstance(professor.get('research_interests'), list) or isinstance(professor.get('expertise_areas'), list):
+        # MongoDB profile format
+        return f"""
+Tên: {professor.get('name', 'N/A')}
+Chức danh: {professor.get('title', 'N/A')}
+Khoa: {professor.get('department', 'N/A')}
+Chuyên môn: {', '.join(professor.get('expertise_areas', []))}
+Lĩnh vực nghiên cứu: {', '.join(professor.get('research_interests', []))}
+Tiểu sử: {professor.get('bio', 'N/A')}
+Học vấn: {professor.get('education', 'N/A')}
+Công trình nghiên cứu: {professor.get('publications', 'N/A')}
+"""
+    else:
+        # JSON file format (backward compatibility)
+        return f"""
+Tên: {professor.get('name', 'N/A')}
+Chức danh: {professor.get('title', 'N/A')}
+Khoa: {professor.get('department', 'N/A')}
+Chuyên môn: {professor.get('expertise', 'N/A')}
+Lĩnh vực nghiên cứu: {professor.get('research_interests', 'N/A')}
+Mô tả: {professor.get('description', 'N/A')}
+Từ khóa: {', '.join(professor.get('keywords', []))}
+"""
+
+
+def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Scale each embedding to unit length (float32), so cosine similarity is a dot product."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    # Row-wise sqrt(sum(x*x)) in one pass, without np.linalg.norm's per-call overhead
+    norms = np.sqrt(np.einsum("ij,ij->i", embeddings, embeddings))[:, None]
+    # Leave all-zero rows as zeros instead of dividing by zero
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
 
 class MatchingService:
     """Service for matching student reports with professor profiles using OpenAI."""
@@ -25,16 +93,10 @@ class MatchingService:
                 "Please set it in your .env file or environment variables."
             )
         
-        # Initialize OpenAI client
-        # Fix for httpx compatibility issue
-        import httpx
-        try:
-            # Try with explicit http_client to avoid proxies issue
-            http_client = httpx.Client(timeout=60.0)
-            self.client = OpenAI(api_key=api_key, http_client=http_client)
-        except Exception:
-            # Fallback to default initialization
-            self.client = OpenAI(api_key=api_key)
+        # Shared OpenAI clients. The async one serves the per-request calls, so a
+        # request waiting on OpenAI doesn't block the event loop for every other request.
+        self.client = get_sync_openai_client()
+        self.async_client = get_openai_client()
         
         # Use text-embedding-3-small or text-embedding-ada-002
         # text-embedding-3-small is newer and better, cheaper than ada-002
@@ -43,77 +105,125 @@ class MatchingService:
             "text-embedding-3-small"  # or "text-embedding-ada-002"
         )
         
+        # Optional shorter embeddings (text-embedding-3-* only), e.g. 512: the
+        # similarity scan and the caches shrink with the dimension count
+        dimensions = os.getenv("OPENAI_EMBEDDING_DIMENSIONS")
+        self._embedding_options = {"dimensions": int(dimensions)} if dimensions else {}
+        # Identifies the embedding space in cache keys
+        self._embedding_cache_id = f"{self.embedding_model}:{dimensions}" if dimensions else self.embedding_model
+        
         # Chat model for analysis generation (default: gpt-4o-mini)
         self.chat_model = os.getenv(
             "OPENAI_CHAT_MODEL",
             "gpt-4o-mini"
         )
         
+        # Normalized query embeddings by text digest, least recently used first
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Created on first use so it binds to the running event loop
+        self._analysis_semaphore = None
+        # Tokenizer of the chat model, loaded on first use (False if unavailable)
+        self._chat_encoding = None
+        
         self.professor_db = ProfessorDatabase()  # Keep for backward compatibility
         self._professor_embeddings = None
         self._professor_data = None
+        # Prompt details per professor, parallel to _professor_data
+        self._professor_prompt_infos = None
         # Load embeddings will be done async now
         self._professor_embeddings_loaded = False
+        # Serializes loads; created on first use so it binds to the running event loop
+        self._load_lock = None
+    
+    async def ensure_professor_embeddings(self):
+        """Load professor embeddings unless already loaded (concurrent callers share one load)."""
+        if self._professor_embeddings_loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self._professor_embeddings_loaded:
+                await self._load_professor_embeddings_async()
+    
+    async def refresh_professor_embeddings_periodically(self, interval_seconds: int = PROFESSOR_REFRESH_SECONDS):
+        """Reload professor embeddings every interval_seconds (only changed profiles are re-embedded)."""
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                async with self._load_lock:
+                    await self._load_professor_embeddings_async()
+            except Exception as e:
+                logger.warning("Could not refresh professor embeddings: %s", e)
     
     async def _load_professor_embeddings_async(self):
         """Load professor profiles from MongoDB and compute embeddings."""
         try:
-            from database.professor_profile_repository import ProfessorProfileRepository
-            profile_repo = ProfessorProfileRepository()
+            from database.professor_profile_repository import get_profile_repo
+            profile_repo = get_profile_repo()
             
-            # Get only complete profiles
-            profiles = await profile_repo.get_all_complete_profiles()
+            # Stream only complete profiles and build texts as batches arrive.
+            # Built aside and swapped in at the end, so requests keep matching
+            # against the previous data while a reload is in progress.
+            profiles = profile_repo.iter_complete_profiles()
+            professor_texts = []
+            professor_data = []
+            
+            async for prof in profiles:
+                professor_texts.append(self._profile_text(prof))
+                professor_data.append(prof)
             
-            if not profiles:
-                print("No complete professor profiles found in MongoDB")
+            if not professor_data:
+                logger.info("No complete professor profiles found in MongoDB")
                 # Fallback to JSON file if no MongoDB profiles
-                profiles = self.professor_db.get_all_professors()
+                for prof in self.professor_db.get_all_professors():
+                    professor_texts.append(self._profile_text(prof))
+                    professor_data.append(prof)
             
-            if not profiles:
+            if not professor_data:
+                self._professor_data, self._professor_prompt_infos = [], []
                 self._professor_embeddings = np.array([])
-                self._professor_data = []
                 self._professor_embeddings_loaded = True
                 return
             
-            # Create combined text for each professor
-            professor_texts = []
-            self._professor_data = []
-            
-            for prof in profiles:
-                # Use profile_text if available, otherwise generate
-                if prof.get("profile_text"):
-                    text = prof["profile_text"]
-                else:
-                    text_parts = [
-                        prof.get("name", ""),
-                        prof.get("title", ""),
-                        prof.get("department", ""),
-                        prof.get("bio", ""),
-                        ", ".join(prof.get("research_interests", [])),
-                        ", ".join(prof.get("expertise_areas", [])),
-                        prof.get("education", ""),
-                        prof.get("publications", ""),
-                    ]
-                    text = " ".join([part for part in text_parts if part])
-                
-                professor_texts.append(text)
-                self._professor_data.append(prof)
-            
-            # Compute embeddings using OpenAI
-            if professor_texts:
-                self._professor_embeddings = self._get_embeddings(professor_texts)
-                print(f"Loaded embeddings for {len(profiles)} professor profiles")
-            else:
-                self._professor_embeddings = np.array([])
-                self._professor_data = []
+            # Normalized once here instead of per query
+            embeddings = _normalize_rows(await self._get_cached_embeddings_async(professor_texts))
+            # Profiles don't change between reloads, so format their prompt details once
+            prompt_infos = [_professor_prompt_info(prof) for prof in professor_data]
+            self._professor_data, self._professor_prompt_infos, self._professor_embeddings = (
+                professor_data, prompt_infos, embeddings
+            )
+            logger.info("Loaded embeddings for %d professor profiles", len(professor_data))
             
             self._professor_embeddings_loaded = True
         except Exception as e:
-            print(f"Error loading professor profiles from MongoDB: {e}")
-            # Fallback to JSON file
-            self._load_professor_embeddings()
+            if self._professor_embeddings_loaded:
+                # A failed refresh keeps serving the profiles that are already loaded
+                logger.warning("Could not reload professor profiles, keeping the current set: %s", e)
+                return
+            logger.error("Error loading professor profiles from MongoDB: %s", e)
+            # Fallback to JSON file (sync OpenAI call, so off the event loop)
+            await asyncio.to_thread(self._load_professor_embeddings)
             self._professor_embeddings_loaded = True
     
+    def _profile_text(self, prof: Dict) -> str:
+        """Get the text to embed for a professor profile."""
+        # Use profile_text if available, otherwise generate
+        if prof.get("profile_text"):
+            return prof["profile_text"]
+        text_parts = [
+            prof.get("name", ""),
+            prof.get("title", ""),
+            prof.get("department", ""),
+            prof.get("bio", ""),
+            ", ".join(prof.get("research_interests", [])),
+            ", ".join(prof.get("expertise_areas", [])),
+            prof.get("education", ""),
+            prof.get("publications", ""),
+        ]
+        return " ".join([part for part in text_parts if part])
+    
     def _get_embeddings(self, texts: List[str]) -> np.ndarray:
         """
         Get embeddings from OpenAI API.
@@ -127,14 +237,81 @@ class MatchingService:
         try:
             response = self.client.embeddings.create(
                 model=self.embedding_model,
-                input=texts
+                input=texts,
+                **self._embedding_options
             )
             # Extract embeddings from response
+            # float32 halves memory and keeps the similarity product on the sgemv path
             embeddings = [item.embedding for item in response.data]
-            return np.array(embeddings)
+            return np.asarray(embeddings, dtype=np.float32)
         except Exception as e:
             raise Exception(f"Error getting embeddings from OpenAI: {str(e)}")
     
+    async def _get_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """Async variant of _get_embeddings."""
+        try:
+            response = await self.async_client.embeddings.create(
+                model=self.embedding_model,
+                input=texts,
+                **self._embedding_options
+            )
+            return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+        except Exception as e:
+            raise Exception(f"Error getting embeddings from OpenAI: {str(e)}")
+    
+    async def _get_cached_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """
+        Get embeddings for texts, only asking OpenAI for those not cached in MongoDB.
+        
+        Restarts (and every serverless cold start) otherwise re-embed all profiles.
+        """
+        from database.embedding_cache_repository import get_embedding_cache_repo
+        cache_repo = get_embedding_cache_repo()
+        
+        digests = [_text_digest(self._embedding_cache_id, text) for text in texts]
+        try:
+            cached = await cache_repo.get_embeddings(list(set(digests)))
+        except Exception as e:
+            logger.warning("Could not read embedding cache: %s", e)
+            cached = {}
+        
+        missing = {digest: text for digest, text in zip(digests, texts) if digest not in cached}
+        if missing:
+            embeddings = await self._get_embeddings_async(list(missing.values()))
+            computed = {
+                digest: np.asarray(embedding, dtype=np.float32).tobytes()
+                for digest, embedding in zip(missing, embeddings)
+            }
+            try:
+                await cache_repo.set_embeddings(computed)
+            except Exception as e:
+                logger.warning("Could not write embedding cache: %s", e)
+            cached.update(computed)
+        
+        return np.stack([np.frombuffer(cached[digest], dtype=np.float32) for digest in digests])
+    
+    async def _get_query_embedding(self, text: str) -> np.ndarray:
+        """Normalized embedding of a query text, cached in memory and in Redis."""
+        digest = _text_digest(self._embedding_cache_id, text)
+        
+        embedding = self._query_embeddings.get(digest)
+        if embedding is not None:
+            self._query_embeddings.move_to_end(digest)
+            return embedding
+        
+        cache_key = f"query_embedding:{digest}"
+        cached = await cache_get(cache_key)
+        if cached is not None:
+            embedding = np.asarray(cached["embedding"], dtype=np.float32)
+        else:
+            embedding = _normalize_rows(await self._get_embeddings_async([text]))[0]
+            await cache_set(cache_key, {"embedding": embedding.tolist()}, ttl=QUERY_EMBEDDING_TTL_SECONDS)
+        
+        self._query_embeddings[digest] = embedding
+        if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+            self._query_embeddings.popitem(last=False)
+        return embedding
+    
     def _load_professor_embeddings(self):
         """Pre-compute embeddings for all professors."""
         professors = self.professor_db.get_all_professors()
@@ -142,6 +319,7 @@ class MatchingService:
         if not professors:
             self._professor_embeddings = np.array([])
             self._professor_data = []
+            self._professor_prompt_infos = []
             return
         
         # Create combined text for each professor (name + expertise + research)
@@ -162,18 +340,58 @@ class MatchingService:
         
         # Compute embeddings using OpenAI
         try:
-            self._professor_embeddings = self._get_embeddings(professor_texts)
-            print(f"Loaded embeddings for {len(professors)} professors")
+            self._professor_embeddings = _normalize_rows(self._get_embeddings(professor_texts))
+            self._professor_prompt_infos = [_professor_prompt_info(prof) for prof in self._professor_data]
+            logger.info("Loaded embeddings for %d professors", len(professors))
         except Exception as e:
-            print(f"Error loading professor embeddings: {e}")
+            logger.error("Error loading professor embeddings: %s", e)
             self._professor_embeddings = np.array([])
             self._professor_data = []
     
+    def _get_chat_encoding(self):
+        """Get the tiktoken encoding of the chat model, or None if tiktoken is unavailable."""
+        if self._chat_encoding is None:
+            try:
+                import tiktoken
+                try:
+                    self._chat_encoding = tiktoken.encoding_for_model(self.chat_model)
+                except KeyError:
+                    self._chat_encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # Not installed, or the encoding file could not be fetched
+                logger.warning("tiktoken not available, truncating reports by characters: %s", e)
+                self._chat_encoding = False
+        return self._chat_encoding or None
+    
+    async def ensure_chat_encoding(self):
+        """Load the chat model's tokenizer in a worker thread (its first load may download the BPE file)."""
+        if self._chat_encoding is None:
+            await asyncio.to_thread(self._get_chat_encoding)
+    
+    def _report_preview(self, report_text: str) -> str:
+        """Excerpt of the report for the analysis prompt."""
+        encoding = self._get_chat_encoding()
+        if encoding is None:
+            if len(report_text) <= REPORT_PREVIEW_MAX_CHARS:
+                return report_text
+            return report_text[:REPORT_PREVIEW_MAX_CHARS] + "..."
+        
+        # Vietnamese text varies a lot in characters per token, so cap the
+        # part that is actually billed. No report needs more than a few
+        # characters per token, so only encode a bounded prefix.
+        prefix = report_text[:REPORT_PREVIEW_MAX_TOKENS * 8]
+        tokens = encoding.encode(prefix)
+        if len(tokens) <= REPORT_PREVIEW_MAX_TOKENS and len(prefix) == len(report_text):
+            return report_text
+        return encoding.decode(tokens[:REPORT_PREVIEW_MAX_TOKENS]) + "..."
+    
     async def _generate_analysis(
         self,
         report_text: str,
         professor: Dict,
-        similarity_score: float
+        similarity_score: float,
+        report_preview: Optional[str] = None,
+        prof_info: Optional[str] = None
     ) -> str:
         """
         Generate analysis explaining why professor is a good match.
@@ -182,38 +400,18 @@ class MatchingService:
             report_text: Student report text
             professor: Professor profile
             similarity_score: Similarity score (0-1)
+            report_preview: Excerpt from _report_preview, when the caller already has it
+            prof_info: Professor details prepared at load time, if available
         
         Returns:
             Analysis text in Vietnamese
         """
         try:
-            # Prepare professor information (support both MongoDB profile and JSON format)
-            if isinstance(professor.get('research_interests'), list) or isinstance(professor.get('expertise_areas'), list):
-                # MongoDB profile format
-                prof_info = f"""
-Tên: {professor.get('name', 'N/A')}
-Chức danh: {professor.get('title', 'N/A')}
-Khoa: {professor.get('department', 'N/A')}
-Chuyên môn: {', '.join(professor.get('expertise_areas', []))}
-Lĩnh vực nghiên cứu: {', '.join(professor.get('research_interests', []))}
-Tiểu sử: {professor.get('bio', 'N/A')}
-Học vấn: {professor.get('education', 'N/A')}
-Công trình nghiên cứu: {professor.get('publications', 'N/A')}
-"""
-            else:
-                # JSON file format (backward compatibility)
-                prof_info = f"""
-Tên: {professor.get('name', 'N/A')}
-Chức danh: {professor.get('title', 'N/A')}
-Khoa: {professor.get('department', 'N/A')}
-Chuyên môn: {professor.get('expertise', 'N/A')}
-Lĩnh vực nghiên cứu: {professor.get('research_interests', 'N/A')}
-Mô tả: {professor.get('description', 'N/A')}
-Từ khóa: {', '.join(professor.get('keywords', []))}
-"""
+            if prof_info is None:
+                prof_info = _professor_prompt_info(professor)
             
-            # Truncate report text if too long (keep first 2000 chars)
-            report_preview = report_text[:2000] + "..." if len(report_text) > 2000 else report_text
+            if report_preview is None:
+                report_preview = self._report_preview(report_text)
             
             prompt = f"""Bạn là một trợ lý AI chuyên phân tích và đánh giá sự phù hợp giữa bài báo cáo của học sinh và profile của giảng viên.
 
@@ -233,27 +431,30 @@ Nội dung bài báo cáo (trích đoạn):
 
 Hãy đưa ra phân tích ngắn gọn:"""
 
-            response = self.client.chat.completions.create(
-                model=self.chat_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Bạn là một trợ lý AI chuyên phân tích và đánh giá sự phù hợp giữa bài báo cáo và profile giảng viên. Hãy đưa ra phân tích ngắn gọn, rõ ràng bằng tiếng Việt."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=300
-            )
+            if self._analysis_semaphore is None:
+                self._analysis_semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+            async with self._analysis_semaphore:
+                response = await self.async_client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": ANALYSIS_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.7,
+                    max_tokens=300
+                )
             
             analysis = response.choices[0].message.content.strip()
             return analysis
             
         except Exception as e:
-            print(f"Error generating analysis: {e}")
+            logger.warning("Error generating analysis: %s", e)
             # Fallback analysis
             return f"Giảng viên này phù hợp với bài báo cáo của bạn với điểm khớp {similarity_score:.1%}. Chuyên môn và lĩnh vực nghiên cứu của giảng viên có nhiều điểm tương đồng với nội dung bạn đang nghiên cứu."
     
@@ -277,65 +478,87 @@ Hãy đưa ra phân tích ngắn gọn:"""
         if not text or len(text.strip()) < 10:
             return []
         
-        # Check if professor embeddings are loaded
-        if self._professor_embeddings is None or not self._professor_embeddings_loaded:
-            print("Warning: Professor embeddings not loaded. Loading now...")
-            await self._load_professor_embeddings_async()
+        # Embeddings are loaded at startup; this only loads them if that failed
+        # (or on a serverless instance where startup did not run)
+        if not self._professor_embeddings_loaded:
+            logger.warning("Professor embeddings not loaded. Loading now...")
+            await self.ensure_professor_embeddings()
         
         if self._professor_embeddings is None:
-            print("Warning: Failed to load professor embeddings")
+            logger.warning("Failed to load professor embeddings")
             return []
         
         # Check if embeddings array is empty
         if hasattr(self._professor_embeddings, 'size') and self._professor_embeddings.size == 0:
-            print("Warning: No professor embeddings available (empty array)")
+            logger.warning("No professor embeddings available (empty array)")
             return []
         
         if len(self._professor_data) == 0:
-            print("Warning: No professor data available")
+            logger.warning("No professor data available")
             return []
         
         # Compute embedding for input text using OpenAI
+        # (repeat uploads and retries of the same text reuse the cached embedding)
         try:
-            query_embedding = self._get_embeddings([text])
+            query_norm = await self._get_query_embedding(text)
         except Exception as e:
-            print(f"Error getting query embedding: {e}")
+            logger.error("Error getting query embedding: %s", e)
             return []
         
-        # Calculate cosine similarity using numpy (replaces sklearn)
-        # Normalize embeddings
-        query_norm = query_embedding / np.linalg.norm(query_embedding)
-        embeddings_norm = self._professor_embeddings / np.linalg.norm(self._professor_embeddings, axis=1, keepdims=True)
-        # Compute cosine similarity: dot product of normalized vectors
-        similarities = np.dot(query_norm, embeddings_norm.T)[0]
+        # Cosine similarity: both sides are unit vectors, so it is a single
+        # matrix-vector product
+        similarities = self._professor_embeddings @ query_norm
         
-        # Get top k matches
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Get top k matches: select them in O(N), then sort only those k
+        if top_k < len(similarities):
+            top_indices = np.argpartition(-similarities, top_k)[:top_k]
+            top_indices = top_indices[np.argsort(-similarities[top_indices])]
+        else:
+            top_indices = np.argsort(-similarities)
+        
+        # Scores for all k matches in one go; tolist() yields plain floats for JSON
+        top_similarities = similarities[top_indices].astype(np.float64)
+        top_scores = top_similarities.tolist()
+        top_percentages = np.round(top_similarities * 100, 2).tolist()
         
         # Build results
         matches = []
-        for idx in top_indices:
-            professor = self._professor_data[idx].copy()
-            similarity = float(similarities[idx])
-            professor["similarity_score"] = similarity
-            professor["match_percentage"] = round(similarity * 100, 2)
-            
-            # Generate analysis if requested
-            if include_analysis:
-                try:
-                    analysis = await self._generate_analysis(
+        prompt_infos = []
+        for idx, similarity, percentage in zip(top_indices, top_scores, top_percentages):
+            # One new dict per match with the scores merged in, leaving the
+            # loaded profile untouched
+            matches.append({
+                **self._professor_data[idx],
+                "similarity_score": similarity,
+                "match_percentage": percentage,
+                "analysis": None,
+            })
+            prompt_infos.append(self._professor_prompt_infos[idx])
+        
+        # Generate analyses if requested; the chat completions are independent,
+        # so run them concurrently instead of one after another
+        if include_analysis:
+            # The same excerpt goes into every prompt; build it once
+            await self.ensure_chat_encoding()
+            report_preview = self._report_preview(text)
+            analyses = await asyncio.gather(
+                *[
+                    self._generate_analysis(
                         report_text=text,
                         professor=professor,
-                        similarity_score=similarity
+                        similarity_score=professor["similarity_score"],
+                        report_preview=report_preview,
+                        prof_info=prof_info
                     )
+                    for professor, prof_info in zip(matches, prompt_infos)
+                ],
+                return_exceptions=True
+            )
+            for professor, analysis in zip(matches, analyses):
+                if isinstance(analysis, Exception):
+                    logger.warning("Error generating analysis for %s: %s", professor.get('name'), analysis)
+                else:
                     professor["analysis"] = analysis
-                except Exception as e:
-                    print(f"Error generating analysis for {professor.get('name')}: {e}")
-                    professor["analysis"] = None
-            else:
-                professor["analysis"] = None
-            
-            matches.append(professor)
         
         return matches
     
@@ -0,0 +1,31 @@
+"""Shared OpenAI clients, so all services reuse one connection pool."""
+import os
+from functools import lru_cache
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Matching fans out several chat completions per request; keep enough warm connections
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+_TIMEOUT = 60.0
+
+
+@lru_cache(maxsize=None)
+def get_openai_client() -> AsyncOpenAI:
+    """Get the shared async OpenAI client (used by every request path)."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    try:
+        # Explicit http_client avoids the httpx proxies compatibility issue
+        return AsyncOpenAI(api_key=api_key, http_client=httpx.AsyncClient(timeout=_TIMEOUT, limits=_LIMITS))
+    except Exception:
+        # Fallback to default initialization
+        return AsyncOpenAI(api_key=api_key)
+
+
+@lru_cache(maxsize=None)
+def get_sync_openai_client() -> OpenAI:
+    """Get the shared sync OpenAI client (only for the JSON-file fallback loader)."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    try:
+        return OpenAI(api_key=api_key, http_client=httpx.Client(timeout=_TIMEOUT))
+    except Exception:
+        return OpenAI(api_key=api_key)
@@ -1,8 +1,10 @@
 """AWS S3 service for file storage."""
+import io
 import os
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
-from typing import Optional
+from typing import BinaryIO, Optional, Union
 import uuid
 from datetime import datetime
 
@@ -10,6 +12,14 @@ from datetime import datetime
 class S3Service:
     """Service for uploading files to AWS S3."""
     
+    # Content type stored with each upload, by file extension
+    CONTENT_TYPES = {
+        'pdf': 'application/pdf',
+        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'doc': 'application/msword',
+        'txt': 'text/plain'
+    }
+    
     def __init__(self):
         """Initialize S3 service."""
         self.aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
@@ -23,16 +33,28 @@ class S3Service:
                 "Please set AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, and AWS_S3_BUCKET_NAME"
             )
         
+        # Public URL of an object is this prefix plus its key
+        self._url_prefix = f"https://{self.bucket_name}.s3.{self.aws_region}.amazonaws.com/"
+        
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
             region_name=self.aws_region
         )
+        
+        # Files up to 8 MB go up in a single PUT; larger ones in 8 MB parts
+        # uploaded concurrently
+        self._transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=8 * 1024 * 1024,
+            max_concurrency=10,
+            use_threads=True
+        )
     
     def upload_file(
         self,
-        file_content: bytes,
+        file_content: Union[bytes, BinaryIO],
         filename: str,
         user_id: str,
         file_type: str
@@ -41,7 +63,8 @@ class S3Service:
         Upload file to S3.
         
         Args:
-            file_content: File content as bytes
+            file_content: File content as bytes, or a binary file which is
+                streamed to S3 in parts instead of being read into memory
             filename: Original filename
             user_id: User ID who uploaded
             file_type: File extension (pdf, docx, etc.)
@@ -55,32 +78,27 @@ class S3Service:
         s3_key = f"test/{user_id}/{timestamp}_{unique_id}_{filename}"
         
         # Determine content type
-        content_type_map = {
-            'pdf': 'application/pdf',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'doc': 'application/msword',
-            'txt': 'text/plain'
-        }
-        content_type = content_type_map.get(file_type.lower(), 'application/octet-stream')
+        content_type = self.CONTENT_TYPES.get(file_type.lower(), 'application/octet-stream')
         
         try:
+            metadata = {
+                'original_filename': filename,
+                'user_id': user_id,
+                'uploaded_at': timestamp
+            }
+            
             # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=file_content,
-                ContentType=content_type,
-                Metadata={
-                    'original_filename': filename,
-                    'user_id': user_id,
-                    'uploaded_at': timestamp
-                }
+            if isinstance(file_content, (bytes, bytearray)):
+                file_content = io.BytesIO(file_content)
+            self.s3_client.upload_fileobj(
+                file_content,
+                self.bucket_name,
+                s3_key,
+                ExtraArgs={'ContentType': content_type, 'Metadata': metadata},
+                Config=self._transfer_config
             )
             
-            # Generate URL
-            s3_url = f"https://{self.bucket_name}.s3.{self.aws_region}.amazonaws.com/{s3_key}"
-            
-            return s3_url, s3_key
+            return self._url_prefix + s3_key, s3_key
         
         except ClientError as e:
             raise Exception(f"Error uploading file to S3: {str(e)}")
@@ -1,7 +1,7 @@
 """AI service for document summarization."""
 import os
-from openai import OpenAI
 from typing import Optional
+from services.openai_client import get_openai_client
 
 
 class DocumentSummarizer:
@@ -13,7 +13,8 @@ class DocumentSummarizer:
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = OpenAI(api_key=api_key)
+        # Shared async client: the request awaits the summary instead of blocking the event loop
+        self.client = get_openai_client()
         self.model = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
     
     async def summarize_document(
@@ -51,7 +52,7 @@ Tóm tắt bằng tiếng Việt, tập trung vào:
 
 Tóm tắt:"""
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Bạn là một trợ lý chuyên tóm tắt các bài báo cáo học thuật."},